@@ -1,14 +1,66 @@
-import glob
+import itertools
 import os
 import subprocess
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 import numpy as np
 import imageio
 import math
-from config import pdf_pages_path, collated_pdfs_path, compiled_pdfs_path
+from config import pdf_pages_path, collated_pdfs_path, compiled_pdfs_path, collate_dpi
 from pathlib import Path
-from typing import Tuple
+from typing import Dict, Optional, Tuple
 from repo_info import load_commit_list
 
+# The folders, wrapped only once instead of on every call
+_pdf_pages_dir = Path(pdf_pages_path)
+_collated_dir = Path(collated_pdfs_path)
+_compiled_dir = Path(compiled_pdfs_path)
+
+# Threads that decode the pages of one commit. Inside the processes of
+# collate_all, which already use every cpu, a single one is used
+_decode_threads = min(4, os.cpu_count() or 1)
+
+try:
+    from turbojpeg import TurboJPEG, TJPF_RGB, TJSAMP_420
+
+    _tj = TurboJPEG()
+except (ImportError, RuntimeError, OSError):
+    # PyTurboJPEG or the libjpeg-turbo library itself is missing, use PIL
+    _tj = None
+
+# Faster png decoders (libdeflate/libspng), imageio is used if neither exists
+try:
+    import imagecodecs
+except ImportError:
+    imagecodecs = None
+try:
+    import pyspng
+except ImportError:
+    pyspng = None
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+
+def _read_png(path) -> np.ndarray:
+    """Decodes a png page into an array, with imagecodecs or pyspng if
+    available, otherwise with imageio (PIL)."""
+    if imagecodecs is not None:
+        return imagecodecs.png_decode(Path(path).read_bytes())
+    if pyspng is not None:
+        return pyspng.load(Path(path).read_bytes())
+    return imageio.imread(path, pilmode="RGB")
+
+
+def _png_shape(path) -> Tuple[int, int]:
+    """Reads the (height, width) of a png from its header, without decoding
+    the image."""
+    with open(path, "rb") as fhand:
+        header = fhand.read(24)
+    # 8 bytes of signature, then the IHDR chunk: length, type, width, height
+    return int.from_bytes(header[20:24], "big"), int.from_bytes(header[16:20], "big")
+
 
 def add_border(image: np.ndarray, width: int = 1) -> np.ndarray:
     """Adds a black border with width `border_width`, in pixels,
@@ -22,7 +74,8 @@ def add_border(image: np.ndarray, width: int = 1) -> np.ndarray:
             np.ndarray: Image with border
     """
     newimage = np.zeros(
-        (image.shape[0] + width * 2, image.shape[1] + width * 2, image.shape[2])
+        (image.shape[0] + width * 2, image.shape[1] + width * 2, image.shape[2]),
+        dtype=image.dtype,
     )
     newimage[width:-width, width:-width, :] = image
     return newimage
@@ -44,14 +97,53 @@ def add_border_c(
             np.ndarray: Image with border
     """
     rows, cols, depth = image.shape
-    # Create new slightly bigger array (border above and below, so 2x)
-    newimage = np.full((rows + border_width * 2, cols + border_width * 2, depth), color)
+    # Create new slightly bigger array (border above and below, so 2x), with
+    # the same dtype as the image. Only the border is painted, since the center
+    # is overwritten by the image anyway
+    newimage = np.empty(
+        (rows + border_width * 2, cols + border_width * 2, depth), dtype=image.dtype
+    )
+    newimage[:border_width] = color
+    newimage[-border_width:] = color
+    newimage[:, :border_width] = color
+    newimage[:, -border_width:] = color
     # Places original image in the center
     newimage[border_width:-border_width, border_width:-border_width, :] = image
     return newimage
 
 
-def collate_pdf_by_sha(sha: str, rows: int, cols: int) -> None:
+def _list_pages(sha: str) -> list:
+    """Returns the paths to the png pages of a commit, in page order"""
+    list_of_images = list((_pdf_pages_dir / sha).glob("*png"))
+    list_of_images.sort(key=lambda x: x.stem)
+    return list_of_images
+
+
+def _collate_pages(
+    list_of_images: list,
+    rows: int,
+    cols: int,
+    page_shape: Optional[Tuple[int, int]] = None,
+) -> np.ndarray:
+    """Arranges the pages in a grid of `rows` x `cols`, with a gray background.
+    The grid is always the full size, so every collated image has the same
+    dimensions for the animation."""
+    assert rows * cols >= len(list_of_images)  # Can't have missing pages
+    if page_shape is not None and _png_shape(list_of_images[0]) != page_shape:
+        # This pdf has a different page size, so the pages are measured again
+        page_shape = None
+    return arrange_pages_horizontal(
+        list_of_images,
+        rows,
+        cols,
+        background_color=(200, 200, 200),
+        page_shape=page_shape,
+    )
+
+
+def collate_pdf_by_sha(
+    sha: str, rows: int, cols: int, page_shape: Optional[Tuple[int, int]] = None
+) -> None:
     """Generates a png image containing all the images generated, side by side,
     with the specific number of rows and columns. Saves it as `{sha}.png` file
     in its appropriate folder
@@ -60,15 +152,38 @@ def collate_pdf_by_sha(sha: str, rows: int, cols: int) -> None:
             sha (str): SHA hash of commit
             rows (int): number of rows
             cols (int): number of columns
+            page_shape (tuple of int, optional): (height, width) of the pages,
+            in pixels. If None, or if the pages have another size, it is read
+            from the first page.
     """
-    list_of_images = list((Path(pdf_pages_path) / sha).glob("*png"))
-    list_of_images.sort(key=lambda x: x.stem)
-    assert rows * cols >= len(list_of_images)  # Can't have missing pages
-    canvas = arrange_pages_horizontal(
-        list_of_images, rows, cols, background_color=(200, 200, 200)
-    )
-    output_path = Path(collated_pdfs_path) / (sha + ".png")
-    imageio.imsave(output_path, canvas)
+    list_of_images = _list_pages(sha)
+    canvas = _collate_pages(list_of_images, rows, cols, page_shape=page_shape)
+    imageio.imsave(_collated_dir / (sha + ".png"), canvas)
+
+
+def collate_pdf_to_jpeg(
+    sha: str,
+    rows: int,
+    cols: int,
+    quality: float = 10,
+    page_shape: Optional[Tuple[int, int]] = None,
+) -> None:
+    """Same as collate_pdf_by_sha, but the collated image is compressed
+    directly into `{sha}.jpeg`, without saving (and reopening) a png first.
+
+        Args:
+            sha (str): SHA hash of commit
+            rows (int): number of rows
+            cols (int): number of columns
+            quality (float, optional): The quality used to compress, higher is
+            better quality. Defaults to 10.
+            page_shape (tuple of int, optional): (height, width) of the pages,
+            in pixels. If None, or if the pages have another size, it is read
+            from the first page.
+    """
+    list_of_images = _list_pages(sha)
+    canvas = _collate_pages(list_of_images, rows, cols, page_shape=page_shape)
+    _save_jpeg(canvas, _collated_dir / f"{sha}.jpeg", quality=quality)
 
 
 def __arrange_pages_vertical(
@@ -91,7 +206,7 @@ def __arrange_pages_vertical(
             (num_rows * page height (px), num_cols * page width (px), 3).
     """
     # Load one page to get the dimensions
-    test_page = imageio.imread(pages[0])
+    test_page = _read_png(pages[0])
     # page_size = test_page.shape
     t_bpage = add_border(test_page)
     t_bpage_w, t_bpage_h, _ = t_bpage.shape
@@ -102,15 +217,13 @@ def __arrange_pages_vertical(
     ideal_num_pages = num_rows * num_cols
     extra_required_pages = ideal_num_pages - len(pages)
     pages = pages + [None] * extra_required_pages
-    # arr_pages = np.array(pages + extra_pages).reshape((num_rows, num_cols))
-    arr_pages = np.array(pages).reshape((num_rows, num_cols))
 
     for i in range(0, num_rows):
         for j in range(0, num_cols):
             # Try to open. If not in range (no more pages left), add blank page
-            page = arr_pages[i, j]
+            page = pages[i * num_cols + j]
             if page:
-                bpage = add_border(imageio.imread(page))
+                bpage = add_border(_read_png(page))
             else:  # Extra page
                 bpage = np.full((t_bpage_w, t_bpage_h, 3), background_color)
             canvas[
@@ -122,8 +235,65 @@ def __arrange_pages_vertical(
     return canvas
 
 
+if numba is not None:
+
+    @numba.njit(parallel=True, cache=True)
+    def _paste_pages(canvas, pages, cell_h, cell_w, border_width, num_cols):
+        """Copies each decoded page of the list `pages` inside its cell of the
+        canvas, row by row, in parallel."""
+        for k in numba.prange(len(pages)):
+            i = k // num_cols
+            j = k % num_cols
+            canvas[
+                i * cell_h + border_width : (i + 1) * cell_h - border_width,
+                j * cell_w + border_width : (j + 1) * cell_w - border_width,
+            ] = pages[k]
+
+else:
+    _paste_pages = None
+
+
+def _paint_cell_borders(
+    canvas: np.ndarray,
+    cell_shape: Tuple[int, int],
+    num_cols: int,
+    num_cells: int,
+    border_width: int = 1,
+    color=(0, 0, 0),
+) -> None:
+    """Paints, in place, the borders of the first `num_cells` cells (row by
+    row) of a canvas divided in a grid of cells of shape `cell_shape`. Instead
+    of going cell by cell, the canvas is viewed as an array of shape (rows, cell
+    height, cols, cell width, depth), so every border strip is painted with a
+    few strided assignments.
+
+        Args:
+            canvas (np.ndarray): The canvas, changed in place
+            cell_shape (tuple of int): (height, width) of each cell, in pixels
+            num_cols (int): The number of columns of the grid
+            num_cells (int): The number of cells that get a border
+            border_width (int, optional): Border width in pixels. Defaults to 1.
+            color (tuple, optional): The color of the border. Defaults to (0, 0,
+            0), black.
+    """
+    cell_h, cell_w = cell_shape
+    num_rows = canvas.shape[0] // cell_h
+    grid = canvas.reshape(num_rows, cell_h, num_cols, cell_w, canvas.shape[2])
+    full_rows, remaining = divmod(num_cells, num_cols)
+    # The complete rows, then the cells of the last, incomplete, row
+    for cells in (grid[:full_rows], grid[full_rows : full_rows + 1, :, :remaining]):
+        cells[:, :border_width] = color
+        cells[:, -border_width:] = color
+        cells[:, :, :, :border_width] = color
+        cells[:, :, :, -border_width:] = color
+
+
 def arrange_pages_horizontal(
-    pages, num_rows, num_cols, background_color=(255, 255, 255)
+    pages,
+    num_rows,
+    num_cols,
+    background_color=(255, 255, 255),
+    page_shape: Optional[Tuple[int, int]] = None,
 ) -> np.ndarray:
     """Concatenates the pages horizontally into a grid of num_rows x num_cols,
     and fills in any remaining space with "blank pages" of the selected
@@ -135,42 +305,97 @@ def arrange_pages_horizontal(
             num_cols (int): the number of columns desired
             background_color (tuple of int, optional): Color to fill in the
             extra pages. Defaults to (255, 255, 255), white.
+            page_shape (tuple of int, optional): (height, width) of the pages,
+            in pixels. If None, the first page is loaded to get it.
 
         Returns:
             numpy array: Contains a numpy array of shape
             (num_rows * page height (px), num_cols * page width (px), 3).
     """
-    # Load one page to get the dimensions
-    test_page = imageio.imread(pages[0])
-    # page_size = test_page.shape
-    t_bpage = add_border(test_page)
-    t_bpage_h, t_bpage_w, _ = t_bpage.shape
-
-    # Create the empty array
-    canvas = np.zeros((num_rows * t_bpage_h, num_cols * t_bpage_w, 3), dtype="uint8")
-    # extra_pages = [None] * (len(pages) - num_rows * num_cols)
-    ideal_num_pages = num_rows * num_cols
-    extra_required_pages = ideal_num_pages - len(pages)
-    pages = pages + [None] * extra_required_pages
-    arr_pages = np.array(pages).reshape((num_rows, num_cols))
-
-    for i in range(0, num_rows):
-        for j in range(0, num_cols):
-            # Try to open. If not in range (no more pages left), add blank page
-            page = arr_pages[i, j]
-            if page:
-                bpage = add_border_c(imageio.imread(page), color=(0, 0, 0))
-            else:  # Extra page
-                bpage = np.full((t_bpage_h, t_bpage_w, 3), background_color)
+    border_width = 1
+    border_color = (0, 0, 0)
+    if page_shape is None:
+        # Load one page to get the dimensions
+        page_shape = _read_png(pages[0]).shape[:2]
+    t_bpage_h = page_shape[0] + 2 * border_width
+    t_bpage_w = page_shape[1] + 2 * border_width
+
+    # The canvas starts filled with the background color, so any cell without
+    # a page ("blank page") needs no extra work
+    canvas = np.full(
+        (num_rows * t_bpage_h, num_cols * t_bpage_w, 3),
+        background_color,
+        dtype=np.uint8,
+    )
+    pages = pages[: num_rows * num_cols]
+    _paint_cell_borders(
+        canvas,
+        (t_bpage_h, t_bpage_w),
+        num_cols,
+        len(pages),
+        border_width=border_width,
+        color=border_color,
+    )
+    # The decoders release the GIL, so the pages are decoded in other threads
+    # while this one copies the finished ones into the canvas
+    with ThreadPoolExecutor(_decode_threads) as executor:
+        futures = {executor.submit(_read_png, page): k for k, page in enumerate(pages)}
+        # Below ~16 pages, numba's compilation/loading isn't worth it
+        if _paste_pages is not None and len(pages) > 16:
+            # A typed list only points to the decoded pages, they aren't copied
+            decoded = numba.typed.List([future.result() for future in futures])
+            _paste_pages(canvas, decoded, t_bpage_h, t_bpage_w, border_width, num_cols)
+            return canvas
+
+        for future in as_completed(futures):
+            i, j = divmod(futures[future], num_cols)
             canvas[
-                i * t_bpage_h : (i + 1) * t_bpage_h,
-                j * t_bpage_w : (j + 1) * t_bpage_w,
-                :,
-            ] = bpage
+                i * t_bpage_h + border_width : (i + 1) * t_bpage_h - border_width,
+                j * t_bpage_w + border_width : (j + 1) * t_bpage_w - border_width,
+            ] = future.result()
 
     return canvas
 
 
+def _rows_cols_to_add(
+    num_rows: int, num_cols: int, size: int, max_steps: int = 100
+) -> Tuple[int, int]:
+    """Finds how many rows and columns have to be added to a grid of num_rows x
+    num_cols so it fits `size` items, adding alternately a row then a column,
+    starting with a row (so at least one row is always added), for at most
+    `max_steps` steps.
+
+        Args:
+            num_rows (int): Initial number of rows
+            num_cols (int): Initial number of columns
+            size (int): Number of items that need to fit
+            max_steps (int, optional): Maximum number of rows + columns added.
+            Defaults to 100.
+
+        Returns:
+            Tuple[int, int]: rows added, columns added
+    """
+    # After adding k rows and k columns, the grid fits (num_rows + k) *
+    # (num_cols + k) items. The smallest k that fits `size` is the positive root
+    # of this quadratic, rounded up. isqrt keeps everything exact.
+    discriminant = (num_rows - num_cols) ** 2 + 4 * size
+    root = math.isqrt(discriminant)
+    if root * root < discriminant:
+        root += 1
+    k = max(0, -(-(root - num_rows - num_cols) // 2))
+
+    if k == 0:
+        adder_r, adder_c = 1, 0
+    elif (num_rows + k) * (num_cols + k - 1) >= size:
+        # The k-th row was enough, no need for the k-th column
+        adder_r, adder_c = k, k - 1
+    else:
+        adder_r, adder_c = k, k
+    if adder_r + adder_c > max_steps:
+        adder_r, adder_c = (max_steps + 1) // 2, max_steps // 2
+    return adder_r, adder_c
+
+
 def determine_ideal_shape(sha: str) -> Tuple[int, int]:
     """Returns a tuple containing the number of rows and columns to better fit a
     specific sha. Work in progress
@@ -181,8 +406,6 @@ def determine_ideal_shape(sha: str) -> Tuple[int, int]:
         Returns:
             Tuple[int, int]: number_rows, number_cols
     """
-    list_of_images = list((Path(pdf_pages_path) / sha).glob("*png"))
-    # list_of_images.sort(key=lambda x: x.stem)
     # 792 - 12 = 780
     # 668
     A4_page_size = (210, 297)  # width, height in mm
@@ -191,21 +414,12 @@ def determine_ideal_shape(sha: str) -> Tuple[int, int]:
     num_a4_on_cols = math.floor(available_size_image[1] / A4_page_size[1])
     # Still thinking if there's a way of determining the best size
     # algorithmically
-    size = len(list_of_images)
+    size = _count_pngs(_pdf_pages_dir / sha)
 
     # Starts with the number of pages that can be fit given the A4 page size,
     # then keeps adding a row and a column, until the canvas could fit more or
     # exactly the number of pages required
-    adder_r = 0
-    adder_c = 0
-
-    for i in range(100):
-        if i % 2 == 0:
-            adder_r += 1
-        else:
-            adder_c += 1
-        if (num_a4_on_rows + adder_r) * (num_a4_on_cols + adder_c) >= size:
-            break
+    adder_r, adder_c = _rows_cols_to_add(num_a4_on_rows, num_a4_on_cols, size)
 
     number_cols = num_a4_on_cols + adder_c
     number_rows = num_a4_on_rows + adder_r
@@ -213,6 +427,24 @@ def determine_ideal_shape(sha: str) -> Tuple[int, int]:
     return number_rows, number_cols
 
 
+def _count_pngs(folder: str) -> int:
+    """Counts the png files in a folder, without creating Path objects"""
+    return sum(1 for entry in os.scandir(folder) if entry.name.endswith(".png"))
+
+
+def count_pages_by_sha() -> Dict[str, int]:
+    """Counts the pages of every dismembered pdf.
+
+        Returns:
+            Dict[str, int]: The number of page images of each commit sha
+    """
+    return {
+        folder.name: _count_pngs(folder.path)
+        for folder in os.scandir(_pdf_pages_dir)
+        if folder.is_dir()
+    }
+
+
 def find_maximum_number_pages(save: bool = True) -> int:
     """Find the maximum number of pages, so that one can better decide the
     number of rows and columns used.
@@ -224,76 +456,118 @@ def find_maximum_number_pages(save: bool = True) -> int:
         Returns:
             int: The maximum number of pages
     """
-    folders = [i for i in Path(pdf_pages_path).glob("*") if i.is_dir()]
-    number_of_images = {
-        folder.stem: len(list(folder.glob("*png"))) for folder in folders
-    }
+    number_of_images = count_pages_by_sha()
     if save:
         with open("number_of_pages.txt", "w") as fhand:
-            fhand.write("sha;pages\n")
-            for sha, number in number_of_images.items():
-                fhand.write(f"{sha};{number}\n")
+            fhand.write(
+                "sha;pages\n"
+                + "".join(
+                    f"{sha};{number}\n" for sha, number in number_of_images.items()
+                )
+            )
     return max(number_of_images.values())
 
 
+def _save_jpeg(image: np.ndarray, path, quality: float = 10) -> None:
+    """Saves an RGB image in jpeg format, with libjpeg-turbo (through
+    PyTurboJPEG) if it's available, otherwise with PIL."""
+    if _tj is not None:
+        with open(path, "wb") as fhand:
+            fhand.write(
+                _tj.encode(
+                    image,
+                    quality=int(quality),
+                    pixel_format=TJPF_RGB,
+                    jpeg_subsample=TJSAMP_420,
+                )
+            )
+        return
+
+    from PIL import Image
+
+    # No `optimize=True`: the second Huffman pass doubles the encoding time
+    # and saves almost nothing at such a low quality
+    Image.fromarray(image).save(path, quality=int(quality))
+
+
 def compress_image(sha: str, quality: float = 10) -> None:
-    """Uses PIL to compress an image with quality `quality` in jpeg format.
+    """Compresses an image with quality `quality` in jpeg format.
 
     Args:
         sha (str): The commit sha
         quality (float, optional): The quality used to compress, higher is
         better quality. Defaults to 10.
     """
-    from PIL import Image
-
-    out = Image.open(Path(collated_pdfs_path) / (sha + ".png"))
-    out.save(
-        Path(collated_pdfs_path) / f"{sha}.jpeg",
-        quality=quality,
-        optimize=True,
-    )
+    image = imageio.imread(_collated_dir / (sha + ".png"), pilmode="RGB")
+    _save_jpeg(image, _collated_dir / f"{sha}.jpeg", quality=quality)
 
 
 def compress_all_images() -> None:
-    uncompressed = Path(collated_pdfs_path).glob("*png")
-    for file in uncompressed:
-        sha = file.stem
-        print("Compressing", sha, "...", end="", flush=True)
-        compress_image(sha, quality=10)
-        print(" Done", flush=True)
+    """Compresses all collated images, in parallel, one image per process"""
+    shas = [file.stem for file in _collated_dir.glob("*png")]
+    with ProcessPoolExecutor() as executor:
+        results = executor.map(compress_image, shas)
+        for i, (sha, _) in enumerate(zip(shas, results)):
+            print(f"({i+1}/{len(shas)}): Compressed {sha}", flush=True)
+
+
+def _init_collate_worker() -> None:
+    """Runs once in each process of collate_all. The processes already use
+    every cpu, so the pages are decoded in a single thread, and numba's kernels
+    run in a single thread, inside them."""
+    global _decode_threads
+    _decode_threads = 1
+    if numba is not None:
+        numba.set_num_threads(1)
+
+
+def _collate_one(sha: str, page_shape: Optional[Tuple[int, int]] = None) -> None:
+    """Collates the pages of a single commit. Module level so it can be sent to
+    worker processes."""
+    # Hard coded because these seem to be the better size for my case
+    collate_pdf_to_jpeg(sha, rows=8, cols=12, quality=10, page_shape=page_shape)
 
 
 def collate_all() -> None:
-    """Goes through every commit and collates their individual .pngs into a single, large image"""
+    """Goes through every commit and collates their individual .pngs into a
+    single, large, compressed image. Commits are independent, so they are
+    processed in parallel, one per process."""
     commits = load_commit_list()
-    for i, commit in enumerate(commits):
-        print(
-            f"({i+1}/{len(commits)}): Merging {commit['sha']}...",
-            end="",
-            flush=True,
-        )
-        if (Path(collated_pdfs_path) / (commit["sha"] + ".png")).is_file():
-            print(" Already processed, skipping.", flush=True)
+    shas = []
+    for commit in commits:
+        if (_collated_dir / (commit["sha"] + ".jpeg")).is_file():
+            print(f"{commit['sha']} already processed, skipping.", flush=True)
             continue
-        # Hard coded because these seem to be the better size for my case
-        collate_pdf_by_sha(commit["sha"], rows=8, cols=12)
-        print(" Done.", flush=True)
+        shas.append(commit["sha"])
+    if not shas:
+        return
+    # Every pdf is rendered with the same dpi, so the page dimensions are
+    # usually the same. They're decoded only once, and each commit only checks
+    # them against its first page's header
+    first_page = min((_pdf_pages_dir / shas[0]).glob("*png"))
+    page_shape = _read_png(first_page).shape[:2]
+    with ProcessPoolExecutor(initializer=_init_collate_worker) as executor:
+        results = executor.map(
+            _collate_one, shas, itertools.repeat(page_shape), chunksize=1
+        )
+        for i, (sha, _) in enumerate(zip(shas, results)):
+            print(f"({i+1}/{len(shas)}): Merged {sha}", flush=True)
 
 
-def dismember_pdf_images_from_sha(sha: str, dpi: int = 50) -> None:
+def dismember_pdf_images_from_sha(sha: str, dpi: int = collate_dpi) -> None:
     """Creates images for each page of a compiled pdf, starting from its sha, using pdftoppm.
 
     Args:
         sha (str): SHA hash of the commit
         dpi (int, optional): the default dpi used for the images. Defaults to
-        50. It's not necessary to be very large.
+        `collate_dpi` in config.py. It's not necessary to be very large.
     """
-    starting_dir = Path(os.getcwd()).absolute()
-    pdf_path = (Path(compiled_pdfs_path) / (sha + ".pdf")).absolute()
-    output_dir = (Path(pdf_pages_path) / sha).absolute()
+    pdf_path = (_compiled_dir / (sha + ".pdf")).absolute()
+    output_dir = (_pdf_pages_dir / sha).absolute()
 
     os.makedirs(output_dir, exist_ok=True)
-    os.chdir(output_dir)
+    # The output prefix includes the folder, so pdftoppm can run from anywhere
+    # and several of them can run at the same time
     subprocess.run(
         [
             "pdftoppm",
@@ -301,19 +575,23 @@ def dismember_pdf_images_from_sha(sha: str, dpi: int = 50) -> None:
             "-r",
             str(dpi),
             "-hide-annotations",
-            pdf_path.absolute(),
-            "pdf",
+            str(pdf_path),
+            str(output_dir / "pdf"),
         ],
         capture_output=False,
     )
-    os.chdir(starting_dir)
 
 
 def dismember_all_pdfs() -> None:
-    """Dismembers all compiled pdfs"""
-    pdf_files = glob.glob(compiled_pdfs_path + "/*pdf")
-    # pdf_files = glob.glob(compiled_pdfs_path + "/*pdf")
-    for i, file in enumerate(pdf_files):
-        print(f"({i+1}:{len(pdf_files)}) Dismembering", file)
-        pdf_path = Path(file)
-        dismember_pdf_images_from_sha(pdf_path.stem, dpi=50)
+    """Dismembers all compiled pdfs. The work is done by pdftoppm, in a
+    subprocess, so a thread per pdf is enough to run them in parallel."""
+    pdf_files = sorted(
+        entry.path
+        for entry in os.scandir(_compiled_dir)
+        if entry.name.endswith(".pdf")
+    )
+    shas = [Path(file).stem for file in pdf_files]
+    with ThreadPoolExecutor() as executor:
+        results = executor.map(dismember_pdf_images_from_sha, shas)
+        for i, (file, _) in enumerate(zip(pdf_files, results)):
+            print(f"({i+1}:{len(pdf_files)}) Dismembered", file, flush=True)
@@ -5,3 +5,9 @@ compiled_pdfs_path = "./pdfs"
 pdf_pages_path = "./imgs"
 collated_pdfs_path = "./collated"
 frames_path = "./frames"
+# Results that only depend on the commits, kept between runs
+cache_path = "./cache"
+
+# Resolution used to convert each pdf page into an image. The collated images
+# are heavily compressed afterwards, so a low dpi is visually the same
+collate_dpi = 25
@@ -1,19 +1,29 @@
 # import pandas as pd
+import copy
 import datetime
 import glob
+import multiprocessing
+import os
 import pickle
+import textwrap
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from collections import Counter
+from functools import lru_cache
 from pathlib import Path
-from typing import List
+from types import SimpleNamespace
+from typing import Dict, List, Optional, Set, Tuple
 
 # To stop a PIL warning that the image is too large
 import PIL
 import imageio
 import matplotlib
 import matplotlib.pyplot as plt
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.backends.backend_pdf import PdfPages
 import numpy as np
 from wordcloud import WordCloud
 
+from collate_pages import count_pages_by_sha
 from config import *
 from text_stats import (
     Stats,
@@ -34,6 +44,15 @@ plt.rcParams.update(
 )
 
 
+# Used instead when drawing the animation frames. Running LaTeX for every text
+# of every frame is by far the slowest part of drawing them
+animation_rc = {
+    "text.usetex": False,
+    "font.family": "serif",
+    "font.serif": ["Latin Modern Roman", "DejaVu Serif"],
+}
+
+
 # Messages to put on specific commit statuses.
 commit_status_messages = {
     "5ed030fd8df9a137338766ca9cdb01d4c3c6a950": "Started writing",
@@ -121,6 +140,102 @@ def create_wordcloud(
     return cloud
 
 
+def words_in_wordcloud(
+    word_Counter: Counter,
+    width: int = 1920,
+    height: int = 1080,
+    background_color: str = "white",
+    **kwargs,
+) -> Set[str]:
+    """Finds the words that create_wordcloud would draw, without placing them.
+    Like WordCloud.generate_from_frequencies, the font size goes down from one
+    word to the next, following their counts, and the words stop once it goes
+    below min_font_size. Only the first two words are actually placed, to find
+    the starting font size.
+
+    Args:
+        word_Counter (Counter): The word counts
+        width (int, optional): Same as in create_wordcloud. Defaults to 1920.
+        height (int, optional): Same as in create_wordcloud. Defaults to 1080.
+        background_color (str, optional): Same as in create_wordcloud. Defaults
+          to "white".
+
+    Returns:
+        Set[str]: The words in the wordcloud
+    """
+    cloud = WordCloud(
+        stopwords={""},
+        width=width,
+        height=height,
+        background_color=background_color,
+        **kwargs,
+    )
+    frequencies = word_Counter.most_common(cloud.max_words)
+    if not frequencies or frequencies[0][1] <= 0:
+        return set()
+    max_frequency = float(frequencies[0][1])
+    frequencies = [(word, count / max_frequency) for word, count in frequencies]
+    if len(frequencies) == 1:
+        font_size = cloud.height
+    else:
+        # Same starting size as generate_from_frequencies, from the first two
+        sizes = [
+            item[1]
+            for item in cloud.generate_from_frequencies(
+                dict(frequencies[:2]), max_font_size=cloud.height
+            ).layout_
+        ]
+        if len(sizes) < 2:
+            font_size = sizes[0]
+        else:
+            font_size = int(2 * sizes[0] * sizes[1] / (sizes[0] + sizes[1]))
+    words = set()
+    last_frequency = 1.0
+    rs = cloud.relative_scaling
+    for word, frequency in frequencies:
+        if frequency == 0:
+            continue
+        if rs != 0:
+            font_size = int(
+                round((rs * (frequency / last_frequency) + (1 - rs)) * font_size)
+            )
+        if font_size < cloud.min_font_size:
+            break
+        words.add(word)
+        last_frequency = frequency
+    return words
+
+
+def _ref_layout_map(wc: WordCloud) -> Dict[str, tuple]:
+    """Maps each word of a wordcloud to its font size, unknown property,
+    position, orientation and color. The reference cloud is the same for every
+    frame, so the map is stored in the wordcloud and only rebuilt if its
+    layout changes.
+
+        Args:
+            wc (WordCloud): The wordcloud
+
+        Returns:
+            Dict[str, tuple]: The (font size, unknown, position, orientation,
+             color) of each word
+    """
+    key = (id(wc.layout_), len(wc.layout_))
+    cached = getattr(wc, "_layout_map", None)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    # layout_: list of (string, font size, position, orientation, color)
+    layout_map = {
+        word: (font_size, unknown, position, orientation, color)
+        for (word, unknown), font_size, position, orientation, color in wc.layout_
+    }
+    wc._layout_map = (key, layout_map)
+    return layout_map
+
+
+# What a word missing from the reference cloud gets in transfer_stats_between_wc
+_missing_word_layout = (0, 0, (0, 0), 0, 0)
+
+
 def transfer_stats_between_wc(
     reference_cloud: WordCloud,
     target_cloud: WordCloud,
@@ -146,20 +261,18 @@ def transfer_stats_between_wc(
         Returns:
             WordCloud: The modified wordcloud
     """
-    # layout_: list of (string, font size, position, orientation, color)
-    ref_cloud_fs = {i[0][0]: i[1] for i in reference_cloud.layout_}
-    ref_cloud_unknown = {i[0][0]: i[0][1] for i in reference_cloud.layout_}
-    ref_cloud_pos = {i[0][0]: i[2] for i in reference_cloud.layout_}
-    ref_cloud_or = {i[0][0]: i[3] for i in reference_cloud.layout_}
-    ref_cloud_col = {i[0][0]: i[4] for i in reference_cloud.layout_}
+    ref_map = _ref_layout_map(reference_cloud)
     # layout_: list of (string, font size, position, orientation, color)
     for i, item in enumerate(target_cloud.layout_):
         word = item[0][0]
-        fs = ref_cloud_fs.get(word, 0) if transfer_fontsize else item[1]
-        unk = ref_cloud_unknown.get(word, 0) if transfer_unk else item[0][1]
-        pos = ref_cloud_pos.get(word, (0, 0)) if transfer_pos else item[2]
-        or_ = ref_cloud_or.get(word, 0) if transfer_orientation else item[3]
-        col = ref_cloud_col.get(word, 0) if transfer_color else item[4]
+        ref_fs, ref_unk, ref_pos, ref_or, ref_col = ref_map.get(
+            word, _missing_word_layout
+        )
+        fs = ref_fs if transfer_fontsize else item[1]
+        unk = ref_unk if transfer_unk else item[0][1]
+        pos = ref_pos if transfer_pos else item[2]
+        or_ = ref_or if transfer_orientation else item[3]
+        col = ref_col if transfer_color else item[4]
         newitem = ((word, unk), fs, pos, or_, col)
         target_cloud.layout_[i] = newitem
     return target_cloud
@@ -199,48 +312,191 @@ def scale_wordcloud(
         transfer_unk=True,
         transfer_color=True,
     )
-    ref_cloud_fs = {i[0][0]: i[1] for i in reference_cloud.layout_}
-    for i, item in enumerate(target_cloud.layout_):
-        word = item[0][0]
-        if scale_type == "linear":
-            scaled_fs = (
-                ref_cloud_fs.get(word, 1) * target_wordcount / reference_wordcount
-            )
-        else:
-            scaled_fs = (
-                ref_cloud_fs.get(word, 1)
-                * np.log10(target_wordcount)
-                / np.log10(reference_wordcount)
-            )
-        # elif scale_type == "logistic":
-        #     assert False  # Not implemented
-        # f(x) = L / (1 + e^(-k(x-x0)))
-        # https://en.wikipedia.org/wiki/Logistic_function
-        # def logistic(x, L, k, x0):
-        #     return L / (1 + 2.71 ** (-k * (x - x0)))
-        # Maximum value will be reference_wordcount * reference_fontsize
-        # Current value will be target_wordcount * word_fontsize
-        # L will be maximum value
-        # k will be found empirically
-        # x0 will be the mean of the values found?
-        # max_val = reference_wordcount * max(ref_cloud_fs.values())
-        # curr_val = target_wordcount * item[1]
-        # min_val = min(i[1] for i in target_cloud.layout_) * target_wordcount
-        # k = 10
-        # # x0 = (max_val + min_val) / (target_wordcount + reference_wordcount)
-        # x0 = (
-        #     max(ref_cloud_fs.values())
-        #     + min(i[1] for i in target_cloud.layout_)
-        # ) / (2)
-        # scaled_fs = logistic(item[1], max_val, k, x0)
+    ref_map = _ref_layout_map(reference_cloud)
+    # All the font sizes are scaled at once, by the same factor
+    if scale_type == "linear":
+        factor = target_wordcount / reference_wordcount
+    else:
+        factor = np.log10(target_wordcount) / np.log10(reference_wordcount)
+    # elif scale_type == "logistic":
+    #     assert False  # Not implemented
+    # f(x) = L / (1 + e^(-k(x-x0)))
+    # https://en.wikipedia.org/wiki/Logistic_function
+    # def logistic(x, L, k, x0):
+    #     return L / (1 + 2.71 ** (-k * (x - x0)))
+    # Maximum value will be reference_wordcount * reference_fontsize
+    # Current value will be target_wordcount * word_fontsize
+    # L will be maximum value
+    # k will be found empirically
+    # x0 will be the mean of the values found?
+    # max_val = reference_wordcount * max(ref_cloud_fs.values())
+    # curr_val = target_wordcount * item[1]
+    # min_val = min(i[1] for i in target_cloud.layout_) * target_wordcount
+    # k = 10
+    # # x0 = (max_val + min_val) / (target_wordcount + reference_wordcount)
+    # x0 = (
+    #     max(ref_cloud_fs.values())
+    #     + min(i[1] for i in target_cloud.layout_)
+    # ) / (2)
+    # scaled_fs = logistic(item[1], max_val, k, x0)
+    layout = target_cloud.layout_
+    ref_fs = np.fromiter(
+        (ref_map[item[0][0]][0] if item[0][0] in ref_map else 1 for item in layout),
+        dtype=np.float64,
+        count=len(layout),
+    )
+    scaled_fs = (ref_fs * factor).tolist()
 
+    for i, (item, fs) in enumerate(zip(layout, scaled_fs)):
         newitem = list(item)
-        newitem[1] = scaled_fs
+        newitem[1] = fs
         # newitem = tuple(newitem)
-        target_cloud.layout_[i] = newitem
+        layout[i] = newitem
     return target_cloud
 
 
+def clone_cloud_with_counts(
+    reference_cloud: WordCloud,
+    word_Counter: Counter,
+    wc_kws: dict,
+    scale_factor: float = 1.0,
+) -> WordCloud:
+    """Creates a wordcloud for word_Counter that reuses the layout of the
+    reference cloud, instead of running the (slow) layout algorithm of
+    create_wordcloud, whose positions, orientations, colors and font sizes would
+    be replaced by the reference ones anyway.
+
+    Only the words of the reference cloud that create_wordcloud would draw for
+    word_Counter are kept, as found by words_in_wordcloud.
+
+        Args:
+            reference_cloud (WordCloud): The wordcloud that supplies the layout
+            word_Counter (Counter): The word counts of the new wordcloud
+            wc_kws (dict): The arguments of create_wordcloud
+            scale_factor (float, optional): Factor applied to the reference font
+             sizes. Defaults to 1.0, the reference sizes.
+
+        Returns:
+            WordCloud: The new wordcloud
+    """
+    present = words_in_wordcloud(word_Counter, **wc_kws)
+    cloud = copy.copy(reference_cloud)
+    # layout_: list of (string, font size, position, orientation, color)
+    cloud.layout_ = [
+        ((word, unk), font_size * scale_factor, position, orientation, color)
+        for (
+            word,
+            unk,
+        ), font_size, position, orientation, color in reference_cloud.layout_
+        if word in present
+    ]
+    return cloud
+
+
+def load_stats(path: str) -> Stats:
+    """Loads a pickled Stats object. The result is cached, so loading the same
+    file again doesn't unpickle it again, unless the file was changed since.
+    The cached object is shared, so it must not be changed.
+
+    Args:
+        path (str): Path to the pickled Stats object
+
+    Returns:
+        Stats: The unpickled object
+    """
+    return _load_stats_version(path, os.stat(path).st_mtime_ns)
+
+
+@lru_cache(maxsize=None)
+def _load_stats_version(path: str, mtime_ns: int) -> Stats:
+    """Unpickles a Stats file. The modification time is only part of the cache
+    key, so a rewritten file is loaded again."""
+    # The whole file is read at once, instead of pickle reading it in small
+    # pieces through the file object
+    return pickle.loads(Path(path).read_bytes())
+
+
+# File in stats_basepath where load_all_stats keeps all the Stats together
+all_stats_filename = "all.pkl"
+
+
+def load_all_stats() -> List[Stats]:
+    """Loads all the pickled Stats files in stats_basepath, sorted from oldest to
+    newest. They're kept together in all_stats_filename, so they can be read
+    from a single file. It's written again when a Stats file is added, removed
+    or changed.
+
+    Returns:
+        List[Stats]: The Stats objects
+    """
+    stats_dir = Path(stats_basepath)
+    all_stats_path = stats_dir / all_stats_filename
+    # Only the directory entries are needed to know if the file is up to date
+    entries = [
+        entry
+        for entry in os.scandir(stats_dir)
+        if entry.name.endswith(".pkl")
+        and entry.name != all_stats_filename
+        and entry.is_file()
+    ]
+    names = sorted(entry.name for entry in entries)
+    newest = max((entry.stat().st_mtime for entry in entries), default=0)
+    if all_stats_path.is_file() and all_stats_path.stat().st_mtime >= newest:
+        cached_names, list_of_Stats = pickle.loads(all_stats_path.read_bytes())
+        if cached_names == names:
+            return list_of_Stats
+
+    # Read in inode order, which is usually closer to where the files are on
+    # disk than the order of their names
+    read_order = [entry.name for entry in sorted(entries, key=lambda e: e.inode())]
+    # Threads, since most of the time is spent waiting for the files, which
+    # doesn't hold the GIL
+    with ThreadPoolExecutor(max_workers=32) as executor:
+        loaded = dict(
+            zip(
+                read_order,
+                executor.map(load_stats, [str(stats_dir / n) for n in read_order]),
+            )
+        )
+    # Back in name order first, so commits with the same date keep their order
+    list_of_Stats = [loaded[name] for name in names]
+    list_of_Stats.sort(key=lambda x: x.date)
+    # Written to another file first, so an interrupted run doesn't leave a
+    # broken file behind
+    tmp_path = all_stats_path.with_name(all_stats_filename + f".{os.getpid()}.tmp")
+    with open(tmp_path, "wb") as fhand:
+        pickle.dump((names, list_of_Stats), fhand, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, all_stats_path)
+    return list_of_Stats
+
+
+# The Stats passed to fix_stats_once and their fixed copies, by commit hash
+_fixed_stats = {}
+
+
+def fix_stats_once(stat: Stats) -> Stats:
+    """Applies fix_specific_things to a copy of the Stats, only once for each
+    loaded Stats. It isn't idempotent (a second call zeroes "NaSal"), so the
+    loaded Stats, which are cached and saved in all_stats_filename, are never
+    changed.
+
+    Args:
+        stat (Stats): The Stats to be fixed
+
+    Returns:
+        Stats: The fixed Stats
+    """
+    cached = _fixed_stats.get(stat.commit_hash)
+    if cached is None or cached[0] is not stat:
+        fixed = copy.copy(stat)
+        # Only the counters are changed by the fix, so only they are copied
+        fixed.word_Counter = stat.word_Counter.copy()
+        fixed.reduced_word_Counter = stat.reduced_word_Counter.copy()
+        cached = _fixed_stats[stat.commit_hash] = (stat, fix_specific_things(fixed))
+    return cached[1]
+
+
+@lru_cache(maxsize=8)
 def load_joined_pdf_image(sha: str, extension: str = ".jpeg") -> np.ndarray:
     """Opens the image using the provided commit sha hash and the extension. Returns a numpy array
 
@@ -251,12 +507,45 @@ def load_joined_pdf_image(sha: str, extension: str = ".jpeg") -> np.ndarray:
         to ".jpeg".
 
     Returns:
-        np.ndarray: The image itself as a numpy array
+        np.ndarray: The image itself as a numpy array (uint8, read only)
     """
-    fig_text = imageio.imread(Path(collated_pdfs_path) / (sha + ".jpeg"))
+    image_path = Path(collated_pdfs_path) / (sha + extension)
+    # The decoded image is kept next to it, so the next runs only have to map
+    # it into memory. It's decoded again if the image changes.
+    cache_path = image_path.with_name(image_path.name + ".npy")
+    if (
+        cache_path.is_file()
+        and cache_path.stat().st_mtime >= image_path.stat().st_mtime
+    ):
+        return np.load(cache_path, mmap_mode="r")
+
+    # PIL directly instead of imageio, which only dispatches to PIL anyway
+    with PIL.Image.open(image_path) as image:
+        fig_text = np.asarray(image)
+    # Written to another file first, so an interrupted run doesn't leave a
+    # broken cache behind
+    tmp_path = cache_path.with_name(cache_path.name + f".{os.getpid()}.tmp")
+    with open(tmp_path, "wb") as fhand:
+        np.save(fhand, fig_text)
+    os.replace(tmp_path, cache_path)
     return fig_text
 
 
+def _blank_axis(ax) -> None:
+    """Hides the ticks and tick labels of an axis, in a single call.
+
+    Args:
+        ax (matplotlib axis): The axis
+    """
+    ax.tick_params(
+        axis="both",
+        which="both",
+        length=0,
+        labelleft=False,
+        labelbottom=False,
+    )
+
+
 def create_frame_() -> matplotlib.figure.Figure:
     """An unsuccessful attempt to use gridspec to create the axes.
 
@@ -283,25 +572,10 @@ def create_frame_() -> matplotlib.figure.Figure:
     ax_stats = fig.add_subplot(gs[3:7, 7:])
     ax_wc = fig.add_subplot(gs[7:, 7:])
 
-    ax_text.set_xticklabels([])
-    ax_text.set_xticks([])
-    ax_text.set_yticklabels([])
-    ax_text.set_yticks([])
-
-    ax_header.set_xticklabels([])
-    ax_header.set_xticks([])
-    ax_header.set_yticklabels([])
-    ax_header.set_yticks([])
-
-    # ax_stats.set_xticklabels([])
-    # ax_stats.set_xticks([])
-    # ax_stats.set_yticklabels([])
-    # ax_stats.set_yticks([])
-
-    ax_wc.set_xticklabels([])
-    ax_wc.set_xticks([])
-    ax_wc.set_yticklabels([])
-    ax_wc.set_yticks([])
+    _blank_axis(ax_text)
+    _blank_axis(ax_header)
+    # _blank_axis(ax_stats)
+    _blank_axis(ax_wc)
     return fig, ax_text, ax_header, ax_stats, ax_wc
 
 
@@ -404,25 +678,10 @@ def create_frame() -> matplotlib.figure.Figure:
         ax_stats.text(0.5, 0.5, "stats")
         ax_wc.text(0.5, 0.5, "wc")
 
-    ax_text.set_xticklabels([])
-    ax_text.set_xticks([])
-    ax_text.set_yticklabels([])
-    ax_text.set_yticks([])
-
-    ax_header.set_xticklabels([])
-    ax_header.set_xticks([])
-    ax_header.set_yticklabels([])
-    ax_header.set_yticks([])
-
-    # ax_stats.set_xticklabels([])
-    # ax_stats.set_xticks([])
-    # ax_stats.set_yticklabels([])
-    # ax_stats.set_yticks([])
-
-    ax_wc.set_xticklabels([])
-    ax_wc.set_xticks([])
-    ax_wc.set_yticklabels([])
-    ax_wc.set_yticks([])
+    _blank_axis(ax_text)
+    _blank_axis(ax_header)
+    # _blank_axis(ax_stats)
+    _blank_axis(ax_wc)
 
     # if debug:
     #     plt.savefig("teste.png")
@@ -430,6 +689,37 @@ def create_frame() -> matplotlib.figure.Figure:
     return fig, ax_text, ax_header, ax_stats, ax_wc
 
 
+def clear_frame(
+    ax_text,
+    ax_header,
+    ax_stats,
+    ax_wc,
+    clear_stats: bool = True,
+    clear_header: bool = True,
+) -> None:
+    """Removes everything drawn in the axes created by create_frame, so the
+    figure can be reused for the next frame.
+
+    Args:
+        ax_text (matplotlib axis): Axis where the collated text appears
+        ax_header (matplotlib axis): Axis where the header appears
+        ax_stats (matplotlib axis): Axis where the stats graph appears
+        ax_wc (matplotlib axis): Axis where the wordcloud appears
+        clear_stats (bool, optional): Also clear the stats graph. Not needed if
+          its lines are updated with update_stats_lines. Defaults to True.
+        clear_header (bool, optional): Also clear the header. Not needed if its
+          texts are updated with update_header. Defaults to True.
+    """
+    if clear_stats:
+        ax_stats.cla()
+    # Clearing brings the ticks back
+    for ax in (ax_text, ax_header, ax_wc):
+        if ax is ax_header and not clear_header:
+            continue
+        ax.cla()
+        _blank_axis(ax)
+
+
 def add_wordcloud(ax_wc, cloud: WordCloud):
     """Adds a wordcloud to a matplotlib axis
 
@@ -444,126 +734,205 @@ def add_wordcloud(ax_wc, cloud: WordCloud):
     return im
 
 
-def add_stats_graph(
-    ax_stats,
+def stats_to_arrays(
     list_of_Stats: List[Stats],
     start_timestamp: int = 1620245425,
-) -> None:
-    """Creates a graph using the attributes specified, using the list_of_Stats,
-    which can be a subset of the total stats you want to consider.
+) -> Dict[str, np.ndarray]:
+    """Converts the attributes plotted by add_stats_graph into one array per
+    attribute, so they're gathered once instead of on every frame.
 
         Args:
-            ax_stats (matplotlib axis): axis where the graph will be plotted
-            list_of_Stats (List[Stats]): the ordered collection of stats to be added, from oldest to newest.
+            list_of_Stats (List[Stats]): the ordered collection of stats, from oldest to newest.
             start_timestamp (int, optional): The timestamp of the first commit to be considered. Defaults to 1531090905,
              which is the first commit I have.
+
+        Returns:
+            Dict[str, np.ndarray]: "days" holds the days elapsed since
+             start_timestamp, and the other keys (the same as color_code_stats)
+             hold the counts of each stat.
     """
-    start_date = datetime.datetime.fromtimestamp(start_timestamp)
-    # Y-Axis: Declaring the containers
-    list_word_counts: List[int] = []
-    list_unique_word_counts: List[int] = []
-    list_fig_count: List[int] = []
-    list_tab_count: List[int] = []
-    list_eq_count: List[int] = []
-    # list_list_count: List[int] = []
-    # list_latex_comm_count: List[int] = []
-    # list_latex_env_count: List[int] = []
-
-    # X-axis: Declaring the containers
-    list_dates: List[datetime.datetime] = []
-    list_delta: List[datetime.timedelta] = []
-    list_deltas_days: List[float] = []
-
-    # Populating the containers
-    for stat in list_of_Stats:
-        # X-axis
-        date = datetime.datetime.fromtimestamp(int(stat.date))
-        delta = date - start_date
-        delta_days = delta.days + delta.seconds / 60 / 60 / 24
-        list_dates.append(date)
-        list_delta.append(delta)
-        list_deltas_days.append(delta_days)
-
-        # Y-axis
-        list_word_counts.append(stat.word_count)
-        list_unique_word_counts.append(stat.unique_word_count)
-        list_fig_count.append(stat.figure_count)
-        list_eq_count.append(stat.equation_counts)
-        # list_list_count.append(stat.listing_count)
-        list_tab_count.append(stat.table_count)
-        # list_latex_comm_count.append(sum(stat.command_Counter.values()))
-        # list_latex_env_count.append(sum(stat.env_Counter.values()))
+    n = len(list_of_Stats)
+
+    def counts(attribute: str) -> np.ndarray:
+        # The size is known, so the array is filled without any list in between
+        return np.fromiter(
+            (getattr(stat, attribute) for stat in list_of_Stats),
+            dtype=np.int32,
+            count=n,
+        )
 
-    ms = 4  # Defining markersize
-    # Plotting everything. Labels and legend are unused at the moment.
-    ax_stats.plot(
-        list_deltas_days,
-        list_word_counts,
-        marker="o",
-        label="Words",
-        ms=ms,
-        c=color_code_stats["wc"],
-    )
-    ax_stats.plot(
-        list_deltas_days,
-        list_unique_word_counts,
-        marker="o",
-        label="UWords",
-        ms=ms,
-        c=color_code_stats["uwc"],
-    )
-    ax_stats.plot(
-        list_deltas_days,
-        list_fig_count,
-        marker="o",
-        label="Figs",
-        ms=ms,
-        c=color_code_stats["fig"],
+    # The elapsed time is found with the timestamps themselves, no datetime
+    # objects are needed
+    timestamps = np.fromiter(
+        (int(stat.date) for stat in list_of_Stats), dtype=np.int64, count=n
     )
-    ax_stats.plot(
-        list_deltas_days,
-        list_eq_count,
-        marker="o",
-        label="Eqs",
-        ms=ms,
-        c=color_code_stats["eq"],
-    )
-    ax_stats.plot(
-        list_deltas_days,
-        list_tab_count,
-        marker="o",
-        label="Table",
-        ms=ms,
-        c=color_code_stats["tab"],
+    return dict(
+        days=(timestamps - start_timestamp) / (60 * 60 * 24),
+        wc=counts("word_count"),
+        uwc=counts("unique_word_count"),
+        fig=counts("figure_count"),
+        tab=counts("table_count"),
+        eq=counts("equation_counts"),
     )
+
+
+def init_stats_lines(ax_stats) -> Dict[str, matplotlib.lines.Line2D]:
+    """Creates the (empty) lines of the stats graph, so that each frame only has
+    to update their data with update_stats_lines.
+
+        Args:
+            ax_stats (matplotlib axis): axis where the graph will be plotted
+
+        Returns:
+            Dict[str, matplotlib.lines.Line2D]: The lines, with the same keys as
+             color_code_stats
+    """
+    ms = 4  # Defining markersize
+    lines = {}
+    # Plotting everything. Labels and legend are unused at the moment.
+    for key, label in (
+        ("wc", "Words"),
+        ("uwc", "UWords"),
+        ("fig", "Figs"),
+        ("eq", "Eqs"),
+        ("tab", "Table"),
+    ):
+        (lines[key],) = ax_stats.plot(
+            [],
+            [],
+            marker="o",
+            label=label,
+            ms=ms,
+            c=color_code_stats[key],
+        )
     ax_stats.set(xlabel="Days elapsed", ylabel="Count")
     ax_stats.grid(which="major", ls="-", color="gray", alpha=0.9)
     ax_stats.grid(which="minor", ls=":", color="gray", alpha=0.5)
+    return lines
 
 
-def add_header(
-    ax_header, reference_Stat: Stats, current_Stat: Stats, message: str
+def update_stats_lines(
+    lines: Dict[str, matplotlib.lines.Line2D],
+    stats_arrays: Dict[str, np.ndarray],
+    i: Optional[int] = None,
 ) -> None:
-    """Takes an axis instance and fills it with text related to a reference
-    Stat, such as time elapsed, and also information about the current stat.
+    """Shows the stats up to (and including) index i in the lines created by
+    init_stats_lines, and rescales their axis.
+
+        Args:
+            lines (Dict[str, matplotlib.lines.Line2D]): The lines of the stats graph
+            stats_arrays (Dict[str, np.ndarray]): The stats, as created by stats_to_arrays
+            i (int, optional): Index of the last stat to be plotted. Defaults to None, which plots all of them.
+    """
+    end = None if i is None else i + 1
+    days = stats_arrays["days"][:end]
+    for key, line in lines.items():
+        line.set_data(days, stats_arrays[key][:end])
+    ax_stats = line.axes
+    ax_stats.relim()
+    ax_stats.autoscale_view()
+
+
+def add_stats_graph(
+    ax_stats,
+    stats_arrays: Dict[str, np.ndarray],
+    i: Optional[int] = None,
+) -> None:
+    """Creates a graph using the attributes specified, using the stats_arrays
+    up to (and including) index i.
+
+        Args:
+            ax_stats (matplotlib axis): axis where the graph will be plotted
+            stats_arrays (Dict[str, np.ndarray]): The stats, as created by stats_to_arrays
+            i (int, optional): Index of the last stat to be plotted. Defaults to None, which plots all of them.
+    """
+    update_stats_lines(init_stats_lines(ax_stats), stats_arrays, i)
+
+
+def _header_strings(
+    current_Stat: Stats, pagenum: Optional[int] = None
+) -> Dict[str, str]:
+    """Creates the texts of the header, except for the message.
 
     Args:
-        ax_header (matplotlib axis): The axis where text will be drawn
-        reference_Stat (Stats): The reference (last) Stat object
         current_Stat (Stats): The current Stat object
-        message (str): The message that needs to be placed
-    """
+        pagenum (int, optional): The number of pages of the current commit. If
+          None, the page images of the commit are counted. Defaults to None.
 
+    Returns:
+        Dict[str, str]: The texts, by their name
+    """
     # Calculate stuff
     timedelta = datetime.datetime.fromtimestamp(
         int(current_Stat.date)
     ) - datetime.datetime.fromtimestamp(1620245425)
     date = str(datetime.datetime.fromtimestamp(int(current_Stat.date)))
     sha = current_Stat.commit_hash
-    pagenum = len(list((Path(pdf_pages_path) / current_Stat.commit_hash).glob("*png")))
+    if pagenum is None:
+        pagenum = len(list((Path(pdf_pages_path) / sha).glob("*png")))
+
+    return dict(
+        sha=sha,
+        date=date,
+        delta=str(timedelta),
+        wordcount=f"Words: {current_Stat.word_count}",
+        unique_wordcount=f"Unique words: {current_Stat.unique_word_count}",
+        pagenum=f"Pages: {pagenum}",
+        numfigs=f"Figures: {current_Stat.figure_count}",
+        numeqs=f"Equations: {current_Stat.equation_counts}",
+        numtabs=f"Tables: {current_Stat.table_count}",
+    )
+
+
+def _header_message(message: str) -> Tuple[str, Tuple[float, float]]:
+    """Wraps the message so it fits in the header, and finds where it goes.
+
+    Args:
+        message (str): The message that needs to be placed
+
+    Returns:
+        str: The wrapped message
+        Tuple[float, float]: Its position
+    """
+    # Same as col2_center and line4_height in add_header
+    message_pos = (0.5, 0.60)
+
+    maximum_width = 50  # Hardcoded to the dimensions of this figure.
+    message = textwrap.fill(message, width=maximum_width)
+    # If there's two lines, move text up a bit to fit better
+    numlines = len(message.split("\n"))
+    if numlines == 2:
+        message_pos = (message_pos[0], message_pos[1] + 0.07)
+    return message, message_pos
+
+
+def add_header(
+    ax_header,
+    reference_Stat: Stats,
+    current_Stat: Stats,
+    message: str,
+    pagenum: Optional[int] = None,
+) -> Dict[str, matplotlib.text.Text]:
+    """Takes an axis instance and fills it with text related to a reference
+    Stat, such as time elapsed, and also information about the current stat.
+
+    Args:
+        ax_header (matplotlib axis): The axis where text will be drawn
+        reference_Stat (Stats): The reference (last) Stat object
+        current_Stat (Stats): The current Stat object
+        message (str): The message that needs to be placed
+        pagenum (int, optional): The number of pages of the current commit. If
+          None, the page images of the commit are counted. Defaults to None.
+
+    Returns:
+        Dict[str, matplotlib.text.Text]: The texts that were placed, which can
+          be changed for another commit with update_header
+    """
+    strings = _header_strings(current_Stat, pagenum)
 
     # Text settings
-    text_options = dict(fontsize=12, usetex=True)
+    # usetex follows rcParams, which create_all_graphs changes for the frames
+    text_options = dict(fontsize=12)
     # Text positions in data coordinates (!) I thought it was axis coordinates,
     # but it's working now.
     line1_height = 0.88
@@ -595,65 +964,60 @@ def add_header(
     numtabs_pos = (col3_right, line6_height)
 
     # Placing the text
+    texts = {}
     # Line 1
-    ax_header.text(*sha_pos, sha, ha="center", **text_options)
+    texts["sha"] = ax_header.text(*sha_pos, strings["sha"], ha="center", **text_options)
     # Line 2
-    ax_header.text(*date_pos, date, ha="left", **text_options)
-    ax_header.text(*delta_pos, str(timedelta), ha="right", **text_options)
+    texts["date"] = ax_header.text(
+        *date_pos, strings["date"], ha="left", **text_options
+    )
+    texts["delta"] = ax_header.text(
+        *delta_pos, strings["delta"], ha="right", **text_options
+    )
     # Stats line 1
-    ax_header.text(
+    texts["wordcount"] = ax_header.text(
         *wordcount_pos,
-        f"Words: {current_Stat.word_count}",
+        strings["wordcount"],
         ha="left",
         color=color_code_stats["wc"],
         **text_options,
     )
-    ax_header.text(
+    texts["unique_wordcount"] = ax_header.text(
         *unique_wordcount_pos,
-        f"Unique words: {current_Stat.unique_word_count}",
+        strings["unique_wordcount"],
         ha="center",
         color=color_code_stats["uwc"],
         **text_options,
     )
-    ax_header.text(
-        *pagenum_pos, f"Pages: {pagenum}", ha="right", color="k", **text_options
+    texts["pagenum"] = ax_header.text(
+        *pagenum_pos, strings["pagenum"], ha="right", color="k", **text_options
     )
     # Stats line 2
-    ax_header.text(
+    texts["numfigs"] = ax_header.text(
         *numfigs_pos,
-        f"Figures: {current_Stat.figure_count}",
+        strings["numfigs"],
         ha="left",
         color=color_code_stats["fig"],
         **text_options,
     )
-    ax_header.text(
+    texts["numeqs"] = ax_header.text(
         *numeqs_pos,
-        f"Equations: {current_Stat.equation_counts}",
+        strings["numeqs"],
         ha="center",
         color=color_code_stats["eq"],
         **text_options,
     )
-    ax_header.text(
+    texts["numtabs"] = ax_header.text(
         *numtabs_pos,
-        f"Tables: {current_Stat.table_count}",
+        strings["numtabs"],
         ha="right",
         color=color_code_stats["tab"],
         **text_options,
     )
 
     # Message line. This ensures the text will fit in the provided area
-    import textwrap
-
-    # Message line
-    message_pos = (col2_center, line4_height)
-
-    maximum_width = 50  # Hardcoded to the dimensions of this figure.
-    message = textwrap.fill(message, width=maximum_width)
-    # If there's two lines, move text up a bit to fit better
-    numlines = len(message.split("\n"))
-    if numlines == 2:
-        message_pos = (message_pos[0], message_pos[1] + 0.07)
-    ax_header.text(
+    message, message_pos = _header_message(message)
+    texts["message"] = ax_header.text(
         *message_pos,
         message,
         ha="center",
@@ -661,18 +1025,170 @@ def add_header(
         va="top",
         **text_options,
     )
+    return texts
+
+
+def update_header(
+    header_texts: Dict[str, matplotlib.text.Text],
+    reference_Stat: Stats,
+    current_Stat: Stats,
+    message: str,
+    pagenum: Optional[int] = None,
+) -> None:
+    """Changes the texts placed by add_header to show another Stat, instead of
+    creating them again.
+
+    Args:
+        header_texts (Dict[str, matplotlib.text.Text]): The texts returned by add_header
+        reference_Stat (Stats): The reference (last) Stat object
+        current_Stat (Stats): The current Stat object
+        message (str): The message that needs to be placed
+        pagenum (int, optional): The number of pages of the current commit. If
+          None, the page images of the commit are counted. Defaults to None.
+    """
+    for name, string in _header_strings(current_Stat, pagenum).items():
+        header_texts[name].set_text(string)
+    message, message_pos = _header_message(message)
+    header_texts["message"].set_text(message)
+    header_texts["message"].set_position(message_pos)
+
+
+# State of the process that draws the frames, set by _init_frame_worker
+_frame_worker = {}
+
+
+def _init_frame_worker(
+    list_of_Stats: List[Stats],
+    stats_arrays: Dict[str, np.ndarray],
+    pagenum_by_sha: Dict[str, int],
+    reference_cloud: WordCloud,
+    wc_kws: dict,
+    rc: dict,
+) -> None:
+    """Creates the figure that the current process will reuse for all the frames
+    it draws, and keeps everything needed to draw them.
+
+        Args:
+            list_of_Stats (List[Stats]): All the (fixed) Stats, from oldest to newest
+            stats_arrays (Dict[str, np.ndarray]): The stats, as created by stats_to_arrays
+            pagenum_by_sha (Dict[str, int]): The number of pages of each commit
+            reference_cloud (WordCloud): The wordcloud that dictates the
+             positioning of the words
+            wc_kws (dict): The arguments used to create the wordclouds
+            rc (dict): matplotlib rcParams used to draw the frames
+    """
+    plt.rcParams.update(rc)
+    # The same figure is used for every frame, only the contents of the axes
+    # are redrawn
+    fig, ax_text, ax_header, ax_stats, ax_wc = create_frame()
+    # The frames are drawn at the final resolution, so the canvas buffer can be
+    # written as is
+    fig.set_dpi(300)
+    # The lines of the stats graph are created once, and only their data
+    # changes on each frame
+    stats_lines = init_stats_lines(ax_stats)
+    ax_stats.set_yscale("log")  # I think I prefer this way
+    # Nothing from a previous figure can be reused, like its header texts
+    _frame_worker.clear()
+    _frame_worker.update(
+        list_of_Stats=list_of_Stats,
+        stats_arrays=stats_arrays,
+        pagenum_by_sha=pagenum_by_sha,
+        reference_cloud=reference_cloud,
+        wc_kws=wc_kws,
+        axes=(fig, ax_text, ax_header, ax_stats, ax_wc),
+        stats_lines=stats_lines,
+    )
+
+
+def _draw_frame(i: int, message: str) -> np.ndarray:
+    """Draws frame i in the figure created by _init_frame_worker.
+
+    Args:
+        i (int): Index of the Stats of the frame
+        message (str): The message to be placed in the header
+
+    Returns:
+        np.ndarray: The RGB image of the frame
+    """
+    list_of_Stats = _frame_worker["list_of_Stats"]
+    fig, ax_text, ax_header, ax_stats, ax_wc = _frame_worker["axes"]
+    stat = list_of_Stats[i]
+    sha = stat.commit_hash
+    clear_frame(
+        ax_text, ax_header, ax_stats, ax_wc, clear_stats=False, clear_header=False
+    )
 
+    # First, fill in the Text axis
+    # Loads the compressed images, although I don't think that improved
+    # performance much.
+    fig_text = load_joined_pdf_image(sha, ".jpeg")
+    ax_text.imshow(fig_text, interpolation="nearest")
+
+    # Next, fill in the header. The texts are created in the first frame, and
+    # only changed in the next ones
+    header_args = dict(
+        reference_Stat=list_of_Stats[0],
+        current_Stat=stat,
+        message=message,
+        pagenum=_frame_worker["pagenum_by_sha"].get(sha, 0),
+    )
+    if "header_texts" not in _frame_worker:
+        _frame_worker["header_texts"] = add_header(ax_header, **header_args)
+    else:
+        update_header(_frame_worker["header_texts"], **header_args)
+    # Then create the Stats graph
+    # Shows every stat up to the current one in the stats graph
+    update_stats_lines(_frame_worker["stats_lines"], _frame_worker["stats_arrays"], i)
+
+    # Lastly create the wordcloud, with the layout of the reference one
+    scaled_cl = clone_cloud_with_counts(
+        _frame_worker["reference_cloud"],
+        stat.reduced_word_Counter,
+        _frame_worker["wc_kws"],
+    )
+    _ = add_wordcloud(ax_wc, scaled_cl)
+
+    fig.canvas.draw()
+    # A copy is needed, the canvas buffer is reused by the next draw. The
+    # alpha channel is dropped, jpeg doesn't support it
+    return np.asarray(fig.canvas.buffer_rgba())[..., :3].copy()
+
+
+def _frame_path(i: int) -> Path:
+    # The frames only go to the video editor, so they don't need to be
+    # lossless, and jpeg is much faster to encode than png
+    return Path(frames_path) / f"{i:03d}.jpg"
 
-def create_all_graphs() -> None:
-    """Creates a figure containing all the graphs and saves it to frames_path."""
+
+def render_frame(args: Tuple[int, str]) -> int:
+    """Draws a frame and saves it to frames_path. Used by the worker processes
+    of create_all_graphs.
+
+        Args:
+            args (Tuple[int, str]): Index of the Stats of the frame, and the
+             message to be placed in the header
+
+        Returns:
+            int: The index of the frame
+    """
+    i, message = args
+    imageio.imwrite(_frame_path(i), _draw_frame(i, message), quality=85)
+    return i
+
+
+def create_all_graphs(processes: Optional[int] = None, usetex: bool = False) -> None:
+    """Creates a figure containing all the graphs and saves it to frames_path.
+
+    Args:
+        processes (int, optional): Number of processes drawing the frames. If 1,
+          the frames are drawn by this process, and only their encoding is done
+          in parallel. Defaults to None, which uses every cpu.
+        usetex (bool, optional): Render the text with LaTeX, which is much
+          slower. Otherwise, animation_rc is used. Defaults to False.
+    """
     # Loads all the pickled Stats files
-    files = Path(stats_basepath).glob("*.pkl")
-    list_of_Stats = []
-    for file in files:
-        with open(file, "rb") as fhand:
-            st = pickle.load(fhand)
-            list_of_Stats.append(st)
-    list_of_Stats.sort(key=lambda x: x.date)
+    list_of_Stats = load_all_stats()
 
     # Creates a standard for the wordclouds that will be created
     wc_kws = dict(
@@ -690,60 +1206,82 @@ def create_all_graphs() -> None:
         list_of_Stats[-1].reduced_word_Counter,
         **wc_kws,
     )
-    # Hardcoded to -2 because my last commit is unrelated to the writing process
-    reference_wc = sum(list_of_Stats[-2].reduced_word_Counter.values())
 
-    starting_stat = fix_specific_things(list_of_Stats[0])
+    # sha '714fad5902cfb17cf54633e4dba4314a74675047' is almost a repeat, but removing it is not necessary
+    list_of_Stats = [fix_stats_once(stat) for stat in list_of_Stats]
+    # The messages depend on the previous commits, so they're found beforehand,
+    # and each frame can be drawn independently
+    messages = []
     previous_message = ""
-
-    # Start of figure creation
-    for i, stat in enumerate(list_of_Stats):
-        sha = stat.commit_hash
-        # sha '714fad5902cfb17cf54633e4dba4314a74675047' is almost a repeat, but removing it is not necessary
-        stat = fix_specific_things(stat)
-        fig, ax_text, ax_header, ax_stats, ax_wc = create_frame()
-
-        # First, fill in the Text axis
-        # Loads the compressed images, although I don't think that improved
-        # performance much.
-        fig_text = load_joined_pdf_image(sha, ".jpeg")
-        ax_text.imshow(fig_text)
-
-        # Next, fill in the header.
+    for stat in list_of_Stats:
         message = stat.description
         if not message:
             message = previous_message
         else:
             previous_message = message
+        messages.append(message)
+    # The stats graph of each frame uses a slice of these
+    stats_arrays = stats_to_arrays(list_of_Stats)
+    # Counting the pages of all commits at once, instead of once per frame
+    pagenum_by_sha = count_pages_by_sha()
+    rc = {} if usetex else animation_rc
+    worker_args = (
+        list_of_Stats,
+        stats_arrays,
+        pagenum_by_sha,
+        reference_cloud,
+        wc_kws,
+        rc,
+    )
+
+    with plt.rc_context(rc):
+        _draw_all_frames(messages, worker_args, processes)
 
-        add_header(
-            ax_header,
-            starting_stat,
-            stat,
-            message=message,
-        )
-        # Then create the Stats graph
-        # Creates and plots the stats graph using every stat up to the current one
-        add_stats_graph(ax_stats, list_of_Stats[: i + 1])
-        ax_stats.set_yscale("log")  # I think I prefer this way
-
-        # Lastly create the wordcloud
-        cloud = create_wordcloud(stat.reduced_word_Counter, **wc_kws)
-        target_wc = sum(stat.reduced_word_Counter.values())
-        scaled_cl = transfer_stats_between_wc(
-            reference_cloud,
-            cloud,
-            transfer_pos=True,
-            transfer_fontsize=True,
-            transfer_color=True,
-            transfer_orientation=True,
-            transfer_unk=True,
-        )
-        _ = add_wordcloud(ax_wc, scaled_cl)
 
-        fig.savefig(Path(frames_path) / f"{i:03d}.png", dpi=300)
-        plt.close(fig)
-        print(f"Processed {i:03d}", flush=True)
+def _draw_all_frames(
+    messages: List[str], worker_args: tuple, processes: Optional[int] = None
+) -> None:
+    """Draws and saves every frame. Called by create_all_graphs.
+
+    Args:
+        messages (List[str]): The message of each frame
+        worker_args (tuple): The arguments of _init_frame_worker
+        processes (int, optional): Number of processes drawing the frames.
+          Defaults to None, which uses every cpu.
+    """
+    if processes is None:
+        processes = os.cpu_count()
+    if processes > 1:
+        # Each frame is independent, so each process draws and saves its own
+        with multiprocessing.Pool(
+            processes, initializer=_init_frame_worker, initargs=worker_args
+        ) as pool:
+            for i in pool.imap_unordered(
+                render_frame, enumerate(messages), chunksize=4
+            ):
+                print(f"Processed {i:03d}", flush=True)
+        return
+
+    _init_frame_worker(*worker_args)
+    # Encoding the jpeg is left to other processes, so the next frame can be
+    # built while the previous one is being written
+    max_workers = max(1, os.cpu_count() - 1)
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        pending = []
+        for i, message in enumerate(messages):
+            pending.append(
+                executor.submit(
+                    imageio.imwrite, _frame_path(i), _draw_frame(i, message), quality=85
+                )
+            )
+            # Don't let the drawn frames pile up in memory if the writers
+            # fall behind
+            if len(pending) > 2 * max_workers:
+                pending.pop(0).result()
+            print(f"Processed {i:03d}", flush=True)
+        for future in pending:
+            future.result()
+    plt.close(_frame_worker["axes"][0])
 
 
 # Functions to test stuff
@@ -776,7 +1314,7 @@ def create_test_Stat(output_filename: str = "test_stats.pkl") -> None:
     st.calculate_stats()
     st = fix_specific_things(st)
     with open(output_filename, "wb") as fhand:
-        pickle.dump(st, fhand)
+        pickle.dump(st, fhand, protocol=pickle.HIGHEST_PROTOCOL)
 
 
 def test_wordcloud(pickle_path: str = "test_stats.pkl") -> None:
@@ -786,8 +1324,7 @@ def test_wordcloud(pickle_path: str = "test_stats.pkl") -> None:
     Args:
         pickle_path (str, optional): The path to the Stat object. Defaults to "test_stats.pkl".
     """
-    with open(pickle_path, "rb") as fhand:
-        st = pickle.load(fhand)
+    st = pickle.loads(Path(pickle_path).read_bytes())
     cloud = create_wordcloud(st.reduced_word_Counter, width=580, height=300)
     # fig, ax_text, ax_header, ax_stats, ax_wc, ax_wc_cb = create_frame_with_cb()
     fig, ax_text, ax_header, ax_stats, ax_wc = create_frame()
@@ -797,51 +1334,150 @@ def test_wordcloud(pickle_path: str = "test_stats.pkl") -> None:
 
 
 def test_stats_graph():
-    files = list(Path(stats_basepath).glob("*.pkl"))
-    list_of_Stats = []
-    for file in files:
-        with open(file, "rb") as fhand:
-            st = pickle.load(fhand)
-            list_of_Stats.append(st)
+    list_of_Stats = load_all_stats()
     list_of_Stats.sort(key=lambda x: x.date, reverse=True)
     fig, ax_text, ax_header, ax_stats, ax_wc = create_frame()
-    add_stats_graph(ax_stats, list_of_Stats[2:])
+    add_stats_graph(ax_stats, stats_to_arrays(list_of_Stats[2:]))
     ax_stats.set_yscale("log")
     plt.show()
 
 
-def test_header():
-    files = glob.glob("./stats/*.pkl")
-    list_of_Stats = []
-    for file in files:
-        with open(file, "rb") as fhand:
-            st = pickle.load(fhand)
-            list_of_Stats.append(st)
-    list_of_Stats.sort(key=lambda x: x.date)
+# State of the process that draws the headers in test_header
+_header_worker = {}
 
-    reference_Stat = list_of_Stats[0]  # First one
 
-    for i, stat in enumerate(list_of_Stats):
+# The attributes of a Stats that the header shows
+_header_attributes = (
+    "commit_hash",
+    "date",
+    "word_count",
+    "unique_word_count",
+    "figure_count",
+    "equation_counts",
+    "table_count",
+)
+
 
-        print(f"Testing header {i}", flush=True)
+def _header_fields(stat: Stats) -> SimpleNamespace:
+    """Copies only the attributes of a Stats that the header shows, so the whole
+    Stats (text, word counters) isn't sent to the processes of test_header.
+
+    Args:
+        stat (Stats): The Stats of a commit
+
+    Returns:
+        SimpleNamespace: The attributes, which add_header reads like a Stats
+    """
+    return SimpleNamespace(**{name: getattr(stat, name) for name in _header_attributes})
+
+
+def _init_header_worker() -> None:
+    """Makes the processes of test_header use the non-interactive backend."""
+    matplotlib.use("agg")
+
+
+def _draw_header(
+    args: Tuple[int, SimpleNamespace, str, int],
+) -> matplotlib.figure.Figure:
+    """Draws the header of a commit. Used by test_header. The figure and the
+    texts of the header are created for the first commit, and only changed for
+    the next ones.
+
+    Args:
+        args (Tuple[int, SimpleNamespace, str, int]): The index of the header,
+          the _header_fields of the commit, its message and its number of pages
+
+    Returns:
+        matplotlib.figure.Figure: The figure with the header
+    """
+    i, fields, message, pagenum = args
+    print(f"Testing header {i}", flush=True)
+    # The header doesn't use the reference Stat
+    header_args = dict(
+        reference_Stat=None,
+        current_Stat=fields,
+        message=message,
+        pagenum=pagenum,
+    )
+    if "fig" not in _header_worker:
         fig, ax_text, ax_header, ax_stats, ax_wc = create_frame()
+        _header_worker["fig"] = fig
+        # Its renderer and pixel buffer are kept between headers, since the
+        # figure always has the same size
+        _header_worker["canvas"] = FigureCanvasAgg(fig)
+        _header_worker["header_texts"] = add_header(ax_header, **header_args)
+    else:
+        update_header(_header_worker["header_texts"], **header_args)
+    return _header_worker["fig"]
+
+
+def _render_header(args: Tuple[int, SimpleNamespace, str, int]) -> int:
+    """Draws the header of a commit and saves it to ./test_headers. Used by
+    test_header.
+
+    Args:
+        args (Tuple[int, SimpleNamespace, str, int]): The index of the header,
+          the _header_fields of the commit, its message and its number of pages
+
+    Returns:
+        int: The index of the header
+    """
+    _draw_header(args)
+    # Straight to the canvas, instead of going through savefig every time
+    _header_worker["canvas"].print_png(
+        f"./test_headers/{args[0]:03d}.png", pil_kwargs={"compress_level": 1}
+    )
+    return args[0]
+
+
+def test_header(singlecore: bool = False, combined_pdf: bool = False):
+    """Draws the header of every commit into ./test_headers, in parallel.
+
+    Args:
+        singlecore (bool, optional): Draw them one by one in this process, which
+          is easier to debug. Defaults to False.
+        combined_pdf (bool, optional): Save all of them as the pages of a single
+          file, ./test_headers/all.pdf, instead of one png each. They're drawn
+          in this process. Defaults to False.
+    """
+    list_of_Stats = load_all_stats()
+
+    pagenum_by_sha = count_pages_by_sha()
+
+    # The messages depend on the previous commits, so they're found beforehand
+    tasks = []
+    previous_message = ""
+    for i, stat in enumerate(list_of_Stats):
         message = commit_status_messages.get(stat.commit_hash, None)
         if not message:
             message = previous_message
         else:
             previous_message = message
-
-        add_header(
-            ax_header,
-            reference_Stat,
-            stat,
-            message=message,
-        )
-        if not Path("./test_headers").is_dir():
-            Path("./test_headers").mkdir()
-
-        plt.savefig(f"./test_headers/{i:03d}")
-        plt.close(fig)
+        pagenum = pagenum_by_sha.get(stat.commit_hash, 0)
+        tasks.append((i, _header_fields(stat), message, pagenum))
+
+    if not Path("./test_headers").is_dir():
+        Path("./test_headers").mkdir()
+
+    if singlecore or combined_pdf:
+        _header_worker.clear()
+        if combined_pdf:
+            with PdfPages("./test_headers/all.pdf") as pdf:
+                for task in tasks:
+                    pdf.savefig(_draw_header(task))
+        else:
+            for task in tasks:
+                _render_header(task)
+        if "fig" in _header_worker:
+            plt.close(_header_worker["fig"])
+        _header_worker.clear()
+        return
+    # New processes instead of forks, so they don't inherit the state of this
+    # one (pyplot figures, numpy/BLAS threads)
+    with multiprocessing.get_context("spawn").Pool(
+        os.cpu_count(), initializer=_init_header_worker
+    ) as pool:
+        pool.map(_render_header, tasks)
 
 
 def test_layout():
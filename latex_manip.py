@@ -1,12 +1,58 @@
 # File containing functions to create, modify, compile PDFs
 
+import hashlib
 import os
+import re
 import shutil
 import subprocess
 import git
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from typing import Optional
 from config import compiled_pdfs_path, thesis_path
-from repo_info import load_commit_list
+from repo_info import load_commit_list, with_worktree
+
+
+def _aux_state(paper_dir: Path, mainfile_name: str) -> bytes:
+    """Hashes the .aux and .toc files of a compilation, to know if another
+    xelatex pass can still change them.
+
+        Args:
+            paper_dir (Path): the folder where the compilation happens
+            mainfile_name (str): the name of the main file, typically main.tex
+        Returns:
+            The hash of both files. Missing files count as empty.
+    """
+    state = hashlib.blake2b()
+    for extension in (".aux", ".toc"):
+        path = paper_dir / (mainfile_name[:-4] + extension)
+        state.update(path.read_bytes() if path.is_file() else b"")
+        # Separates the files, so the same bytes split differently don't match
+        state.update(b"\0")
+    return state.digest()
+
+
+def _run_tex_tool(command: tuple, cwd: Path, verbose: bool) -> None:
+    """Runs one of the latex tools and waits for it to finish. Errors are
+    ignored, like with -interaction=nonstopmode.
+
+        Args:
+            command (tuple): the program and its arguments
+            cwd (Path): the folder where it runs
+            verbose (bool): If set to true, shows its output.
+    """
+    # The output is thrown away unless verbose, instead of being captured and
+    # kept in memory. xelatex still writes its own .log file. stdin is closed
+    # so a tool waiting for input can't hang the compilation.
+    output = None if verbose else subprocess.DEVNULL
+    _ = subprocess.run(
+        command,
+        cwd=cwd,
+        stdin=subprocess.DEVNULL,
+        stdout=output,
+        stderr=output,
+        check=False,
+    )
 
 
 def compile_pdf_from_sha(
@@ -23,7 +69,8 @@ def compile_pdf_from_sha(
     then copies the pdf to the path specified in `output_path`. Requires a
     git.Repo instance pointing to the repository. Can remove lines that contain
     "includeonly", so it compiles the full text. Verbose can be used to show, or
-    not, the compilation output.
+    not, the compilation output. If latexmk is installed, it decides how many
+    passes are needed.
 
         Args:
             sha (str): the sha hash that git can use to checkout
@@ -46,6 +93,16 @@ def compile_pdf_from_sha(
     )
     makeindex_command = ("makeindex", mainfile_name)
     bibtex_command = ("bibtex", mainfile_name[:-4])
+    # latexmk runs makeindex and bibtex itself, and only as many xelatex passes
+    # as needed. -f keeps going after errors, like the passes below do.
+    latexmk_command = (
+        "latexmk",
+        "-xelatex",
+        "-shell-escape",
+        "-interaction=nonstopmode",
+        "-f",
+        mainfile_name,
+    )
 
     # Create folder if not exists
     os.makedirs(output_path, exist_ok=True)
@@ -54,22 +111,20 @@ def compile_pdf_from_sha(
         print(f"Already compiled {sha}, skipping")
         return
 
-    # It's easier to change dirs because of the latex commands, copy the pdf,
-    # then change back
-    original_dir = os.getcwd()
-    os.chdir(texfile_location+"/paper")
+    # The latex commands run inside this folder, instead of changing the
+    # working directory of the whole process
+    paper_dir = Path(texfile_location) / "paper"
+    maintex_path = paper_dir / mainfile_name
 
     if fix_includeonly:
-        maintex = open(mainfile_name, "r").readlines()
-        # Very crude
-        for i, line in enumerate(maintex):
-            if "includeonly" in line:
-                # maintex.replace("includeonly", "")
-                maintex[i] = ""
-        with open(mainfile_name, "w") as fhand:
-            fhand.write(
-                "".join(maintex)
-            )  # not "\n".join... Because written in Windows?
+        maintex = maintex_path.read_bytes()
+        # Very crude: removes every line that mentions includeonly. Only
+        # written back if there's one
+        if b"includeonly" in maintex:
+            maintex = re.sub(
+                rb"^[^\n]*includeonly[^\n]*\n?", b"", maintex, flags=re.M
+            )
+            maintex_path.write_bytes(maintex)
 
     # One specific commit had a problem, where there was a table in the file
     # "aditivos.tex" where the first cell title was [NaSal], and the previous
@@ -77,48 +132,72 @@ def compile_pdf_from_sha(
     # considering it to be \toprule[NaSal], and accusing NaSal of not being a
     # number, freezing compilation.
     if sha.startswith("df17dbd"):
-        problematic_text = open("aditivos.tex", "r").read()
-        import re
-
+        problematic_text = open(paper_dir / "aditivos.tex", "r").read()
         problematic_text = re.sub(
             r"\\toprule([\s%]+?)\[NaSal\]",
             r"\\toprule\1NaSal",
             problematic_text,
         )
-        with open("aditivos.tex", "w") as fhand:
+        with open(paper_dir / "aditivos.tex", "w") as fhand:
             fhand.write(problematic_text)
 
-    print("\tCompilation 1", flush=True)
-    _ = subprocess.run(xelatex_command, capture_output=not verbose)
-    print("\tIndex", flush=True)
-    _ = subprocess.run(makeindex_command, capture_output=not verbose)
-    print("\tReferences", flush=True)
-    _ = subprocess.run(bibtex_command, capture_output=not verbose)
-    print("\tCompilation 2", flush=True)
-    _ = subprocess.run(xelatex_command, capture_output=not verbose)
-    print("\tCompilation 3", flush=True)
-    _ = subprocess.run(xelatex_command, capture_output=not verbose)
-    print("\tCompilation 4", flush=True)
-    _ = subprocess.run(xelatex_command, capture_output=not verbose)
+    if shutil.which("latexmk"):
+        print("\tCompilation (latexmk)", flush=True)
+        _run_tex_tool(latexmk_command, paper_dir, verbose)
+    else:
+        print("\tCompilation 1", flush=True)
+        _run_tex_tool(xelatex_command, paper_dir, verbose)
+        print("\tIndex", flush=True)
+        _run_tex_tool(makeindex_command, paper_dir, verbose)
+        print("\tReferences", flush=True)
+        _run_tex_tool(bibtex_command, paper_dir, verbose)
+        # Up to three more passes, but once a pass leaves the .aux and .toc
+        # as they were, the next ones wouldn't change anything either
+        previous_state = _aux_state(paper_dir, mainfile_name)
+        for compilation in range(2, 5):
+            print(f"\tCompilation {compilation}", flush=True)
+            _run_tex_tool(xelatex_command, paper_dir, verbose)
+            state = _aux_state(paper_dir, mainfile_name)
+            if state == previous_state:
+                break
+            previous_state = state
     print(flush=True)
     print("\tCompilation done", flush=True)
 
     shutil.copy(
-        mainfile_name[:-4] + ".pdf",
-        Path(original_dir) / Path(output_path) / f"{sha}.pdf",
+        paper_dir / (mainfile_name[:-4] + ".pdf"),
+        Path(output_path) / f"{sha}.pdf",
     )
 
-    os.chdir(original_dir)
 
+def _compile_one(sha: str) -> None:
+    """Compiles the pdf of a single commit in its own worktree. Module level so
+    it can be sent to worker processes."""
+    # Don't create a worktree just to find out it was already compiled
+    if os.path.isfile(Path(compiled_pdfs_path) / (sha + ".pdf")):
+        print(f"Already compiled {sha}, skipping")
+        return
+    with with_worktree(sha) as worktree_path:
+        compile_pdf_from_sha(
+            sha, git.Repo(worktree_path), texfile_location=worktree_path
+        )
+
+
+def compile_all_pdfs(processes: Optional[int] = None) -> None:
+    """Compiles all pdfs possible. Each commit is compiled in its own worktree,
+    so they can be compiled in parallel, one per process.
 
-def compile_all_pdfs() -> None:
-    """Compiles all pdfs possible."""
+        Args:
+            processes (int, optional): Number of processes used. Defaults to
+            None, which uses one per cpu.
+    """
 
     commits = load_commit_list()
-    repo = git.Repo(thesis_path)
-    for i, commit in enumerate(commits):
-        print(
-            f'Compilation {i+1} of {len(commits)}: {commit["message"]}',
-            flush=True,
-        )
-        compile_pdf_from_sha(commit["sha"], repo, verbose=False)
+    shas = [commit["sha"] for commit in commits]
+    with ProcessPoolExecutor(processes) as executor:
+        results = executor.map(_compile_one, shas, chunksize=1)
+        for i, (commit, _) in enumerate(zip(commits, results)):
+            print(
+                f'Compiled {i+1} of {len(commits)}: {commit["message"]}',
+                flush=True,
+            )
@@ -43,7 +43,9 @@ def main():
                 dismember_all_pdfs()
             if (choice == "5") or (choice == "8"):
                 collate_all()
-            if (choice == "6") or (choice == "8"):
+            if choice == "6":
+                # Only needed for old .png collated images, collate_all already
+                # saves them compressed
                 compress_all_images()
             if (choice == "7") or (choice == "8"):
                 create_all_graphs()
@@ -52,7 +54,7 @@ def main():
 def create_directories() -> None:
     print("Checking folders...")
     for key, val in config.__dict__.items():
-        if key.startswith("__"):
+        if key.startswith("__") or not isinstance(val, str):
             continue
         folder = Path(val)
         print("\tChecking", folder)
@@ -2,6 +2,12 @@
 # as number of commits, their ids, the date they were created, and so on
 # Uses gitpython to make the process easier
 
+import shutil
+import subprocess
+import tempfile
+from contextlib import contextmanager
+from typing import Iterator, List, Optional
+
 import git
 from config import thesis_path
 
@@ -16,12 +22,12 @@ def create_commit_list(
         List of dicts containing the same elements that were written to the file
     """
     repo = git.Repo(thesis_path)
-    repo.git.checkout('master', '--force')
     commits = []
     with open(out_filename, "w", encoding="utf8") as fhand:
         # Write header to file
         fhand.write("sha;message;timestamp\n")
-        for commit in repo.iter_commits():
+        # Read from the history of master, without checking it out
+        for commit in repo.iter_commits("master"):
             sha = commit.hexsha
             message = commit.message.rstrip().replace("\n", " ")
             # Needs to be converted afterwards to a datetime object. To store,
@@ -53,6 +59,74 @@ def load_commit_list(filename: str = "git_commits_info.txt") -> list:
     return commits
 
 
+@contextmanager
+def with_worktree(sha: str, repo_path: str = thesis_path) -> Iterator[str]:
+    """Checks out a commit in its own temporary git worktree, so several commits
+    can be worked on at the same time without touching the main checkout. The
+    worktree is removed when the context ends.
+
+        Args:
+            sha (str): The commit sha hash
+            repo_path (str, optional): Path to the repository. Defaults to
+            thesis_path.
+        Yields:
+            Path to the checked out worktree
+    """
+    repo = git.Repo(repo_path)
+    path = tempfile.mkdtemp(prefix=f"wt-{sha}-")
+    added = False
+    try:
+        repo.git.worktree("add", "--detach", path, sha)
+        added = True
+        yield path
+    finally:
+        # If the add failed, git doesn't know about the folder, and removing it
+        # through git would raise an error that hides the first one
+        if added:
+            repo.git.worktree("remove", "--force", path)
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def read_commit_files(
+    specs: List[str], repo_path: str = thesis_path
+) -> List[Optional[bytes]]:
+    """Reads files of any commit straight from the git object database, without
+    checking anything out. All of them are read by a single git cat-file
+    process.
+
+        Args:
+            specs (List[str]): The files, as "<sha>:<path inside the repo>"
+            repo_path (str, optional): Path to the repository. Defaults to
+            thesis_path.
+        Returns:
+            The contents of each file, in the same order. None if the file
+            doesn't exist in that commit.
+    """
+    request = "".join(spec + "\n" for spec in specs).encode("utf8")
+    output = subprocess.run(
+        ("git", "cat-file", "--batch"),
+        input=request,
+        capture_output=True,
+        check=True,
+        cwd=repo_path,
+    ).stdout
+    # Each answer is "<oid> <type> <size>\n<contents>\n", or "<spec> missing\n"
+    contents = []
+    position = 0
+    for _ in specs:
+        header_end = output.index(b"\n", position)
+        header = output[position:header_end].split(b" ")
+        position = header_end + 1
+        if len(header) != 3:
+            contents.append(None)
+            continue
+        size = int(header[2])
+        data = output[position : position + size]
+        position += size + 1
+        contents.append(data if header[1] == b"blob" else None)
+    return contents
+
+
 def test_repo_info():
     create_commit_list()
     print(load_commit_list("git_commits_info.txt"))
@@ -1,17 +1,25 @@
 # Used to create stats of a specific commit, such as the number of pages of the
 # pdf file, the number of words, number of sections, etc
 
-from config import thesis_path, stats_basepath
+from config import thesis_path, stats_basepath, cache_path
+import copy
 import os
+import fnmatch
+import hashlib
+import multiprocessing
 import glob
+import json
 import re
 from collections import Counter
 import pathlib
-from typing import Union, List
+from typing import Union, List, Optional, Dict, Mapping, Tuple
 import pandas as pd
 import pickle
+import shelve
 import git
-from repo_info import load_commit_list
+from git import Blob
+from concurrent.futures import ProcessPoolExecutor
+from repo_info import load_commit_list, read_commit_files
 
 try:
     import nltk
@@ -565,7 +573,7 @@ class Stats:
             self.output_path / (self.name + "-" + self.commit_hash + ".pkl"),
             "wb",
         ) as fhand:
-            pickle.dump(self, fhand)
+            pickle.dump(self, fhand, protocol=pickle.HIGHEST_PROTOCOL)
 
     def _save_intermediary_text(
         self, filename, annotation: str, text: str, restart=False
@@ -722,14 +730,98 @@ def create_stats_all_tex_files(commit_hash: str, description: str) -> Stats:
     return st
 
 
+def _matches_glob(path: str, pattern: str) -> bool:
+    """Checks a relative path against a glob pattern the way glob.glob (not
+    recursive) does: one component at a time, so "**" is the same as "*", and
+    hidden files only match patterns that start with a dot.
+
+        Args:
+            path (str): The path, with "/" as separator
+            pattern (str): The glob pattern
+
+        Returns:
+            bool: Whether glob.glob would have found the path
+    """
+    parts = path.split("/")
+    pattern_parts = pattern.split("/")
+    if len(parts) != len(pattern_parts):
+        return False
+    return all(
+        fnmatch.fnmatchcase(part, pattern_part)
+        and (not part.startswith(".") or pattern_part.startswith("."))
+        for part, pattern_part in zip(parts, pattern_parts)
+    )
+
+
+# Decoded texts of the tex files, by the hexsha of their blob. Filled by
+# create_all_stats and kept between runs
+blob_texts_path = pathlib.Path(cache_path) / "blob_texts"
+
+
+def _decode_tex(data: bytes) -> str:
+    """Decodes a tex file read from git the same way open_file reads it, with
+    universal newlines."""
+    return data.decode("utf8").replace("\r\n", "\n").replace("\r", "\n")
+
+
+def _tex_blobs(commit: git.Commit, filename_pattern: str) -> List[Tuple[str, Blob]]:
+    """Finds the files of a commit that match the pattern, without reading them.
+
+        Args:
+            commit (git.Commit): The commit
+            filename_pattern (str): The glob pattern of the files, relative to
+            the paper folder
+
+        Returns:
+            List[Tuple[str, Blob]]: The path relative to the paper folder and
+            the git blob of each file
+    """
+    blobs = []
+    try:
+        paper_tree = commit.tree["paper"]
+    except KeyError:  # Like globbing a folder that doesn't exist
+        return blobs
+    for blob in paper_tree.traverse():
+        if blob.type != "blob":
+            continue
+        relative_path = blob.path[len("paper/") :]
+        if _matches_glob(relative_path, filename_pattern):
+            blobs.append((relative_path, blob))
+    return blobs
+
+
+def _read_tex_files(
+    tex_blobs: List[Tuple[str, str]], blob_texts: Mapping[str, str]
+) -> List[Tuple[str, str]]:
+    """Gets the texts of the .tex files of a commit from the already decoded
+    texts, without going through the commit again.
+
+        Args:
+            tex_blobs (List[Tuple[str, str]]): The path relative to the paper
+            folder and the blob hexsha of each file, as found by _tex_blobs
+            blob_texts (Mapping[str, str]): The decoded texts, by blob hexsha
+
+        Returns:
+            List[Tuple[str, str]]: The path (as glob.glob would have given it
+            for thesis_path) and the text of each file
+    """
+    paper_path = pathlib.Path(thesis_path + "/paper")
+    return [
+        (str(paper_path / relative_path), blob_texts[hexsha])
+        for relative_path, hexsha in tex_blobs
+    ]
+
+
 def create_stats_from_sha(
     sha: str,
     repo: git.Repo,
     filename_pattern: str = "**/*.tex",
     merge: bool = True,
+    tex_files: Optional[List[Tuple[str, str]]] = None,
 ) -> List[Stats]:
     """Creates a stats object and computes its values starting from a commit
-    hash and a git.Repo object pointing to the repo.
+    hash and a git.Repo object pointing to the repo. The files are read from
+    the commit itself, so nothing is checked out.
 
         Args:
             sha (str): The commit sha hash
@@ -738,24 +830,33 @@ def create_stats_from_sha(
             appropriate files. Defaults to "*.tex".
             merge (bool, optional): Whether or not to compute the stats for all
             the files as one, or to compute them individually. Defaults to True.
+            tex_files (List[Tuple[str, str]], optional): The path and text of
+            each file, if they were already read. Defaults to None, which reads
+            them from the commit.
 
         Returns:
             List[Stats]: A list containing the individual Stats for each file considered. If `merge==True`,
             then its a single item list.
     """
 
-    repo.git.checkout(sha, force=True)
-    date = repo.commit().committed_date
-    commit_message = repo.commit().message.partition("\n")[0]
-
-    path = pathlib.Path(thesis_path+"/paper")
-    tex_files = glob.glob(str(path / filename_pattern))
+    commit = repo.commit(sha)
+    date = commit.committed_date
+    commit_message = commit.message.partition("\n")[0]
+
+    if tex_files is None:
+        tex_blobs = _tex_blobs(commit, filename_pattern)
+        blob_texts = {
+            blob.hexsha: _decode_tex(blob.data_stream.read()) for _, blob in tex_blobs
+        }
+        tex_files = _read_tex_files(
+            [(relative_path, blob.hexsha) for relative_path, blob in tex_blobs],
+            blob_texts,
+        )
     # assert len(tex_files) >= 1
 
     if merge:
         list_text: List[str] = []
-        for file in tex_files:
-            text = open_file(file)
+        for file, text in tex_files:
             list_text.append(text)
         full_text = "\n".join(list_text)
         st = Stats(
@@ -770,8 +871,7 @@ def create_stats_from_sha(
         return [st]
     else:
         list_stats: List[Stats] = []
-        for file in tex_files:
-            text = open_file(file)
+        for file, text in tex_files:
             st = Stats(
                 file,
                 text=text,
@@ -784,42 +884,141 @@ def create_stats_from_sha(
         return list_stats
 
 
+def find_includeonlys(
+    shas: List[str], mainfile: str = "paper/main.tex"
+) -> Dict[str, Optional[Tuple[int, str]]]:
+    """Finds the first line containing \\includeonly in the main file of each
+    commit. The file is read from the git objects, without checking the commits
+    out. A commit never changes, so the results are kept in
+    cache_path/includeonly.json and only new commits are read.
+
+        Args:
+            shas (List[str]): The commit sha hashes
+            mainfile (str, optional): The main file, relative to the repository.
+            Defaults to "paper/main.tex".
+
+        Returns:
+            Dict[str, Optional[Tuple[int, str]]]: The line number and the line
+            of each commit, or None if it doesn't have one.
+    """
+    cache_file = pathlib.Path(cache_path) / "includeonly.json"
+    cache = {}
+    if cache_file.is_file():
+        cache = json.loads(cache_file.read_text(encoding="utf8"))
+
+    keys = {sha: f"{sha}:{mainfile}" for sha in shas}
+    missing = [sha for sha in shas if keys[sha] not in cache]
+    if missing:
+        texts = read_commit_files([keys[sha] for sha in missing])
+        for sha, text in zip(missing, texts):
+            cache[keys[sha]] = None
+            # A single search on the bytes, instead of going line by line
+            position = -1 if text is None else text.find(b"includeonly")
+            if position == -1:
+                continue
+            start = text.rfind(b"\n", 0, position) + 1
+            end = text.find(b"\n", position)
+            line = text[start : end if end != -1 else len(text)]
+            cache[keys[sha]] = (
+                text.count(b"\n", 0, start),
+                line.decode("utf8", "replace").strip(),
+            )
+        os.makedirs(cache_path, exist_ok=True)
+        cache_file.write_text(json.dumps(cache), encoding="utf8")
+
+    return {
+        sha: None if cache[keys[sha]] is None else tuple(cache[keys[sha]])
+        for sha in shas
+    }
+
+
 def test_all_includeonlys() -> None:
     """Tests commit by commit if there's a line containing \\includeonly. This
     needs to be removed to better represent the evolution of the pages
     """
-    from repo_info import load_commit_list
-
     commits = load_commit_list()
-    repo = git.Repo(thesis_path)
-    for i, commit in enumerate(commits):
-        repo.git.checkout(commit["sha"], force=True)
-        maintex = open(
-            pathlib.Path(thesis_path) / pathlib.Path("main.tex"), "r"
-        ).readlines()
-        for j, line in enumerate(maintex):
-            if "includeonly" in line:
-                print(f'{commit["sha"]}, line {j}: {line.strip()}')
-                break
+    includeonlys = find_includeonlys([commit["sha"] for commit in commits])
+    for commit in commits:
+        found = includeonlys[commit["sha"]]
+        if found is not None:
+            j, line = found
+            print(f'{commit["sha"]}, line {j}: {line}')
         else:
             print(fr'{commit["sha"]}: Commit does not have an \includeonly statement')
 
 
-def create_all_stats() -> None:
-    """Creates a Stats class for all commits in the repository, merging all tex files"""
+def _create_stats_group(shas: List[str], tex_blobs: List[Tuple[str, str]]) -> None:
+    """Creates and saves the Stats of commits that have the same text, computing
+    them only once. Module level so it can be sent to worker processes. The
+    texts are read from the blob_texts cache filled by create_all_stats.
+
+        Args:
+            shas (List[str]): The commit sha hashes, all with the same text
+            tex_blobs (List[Tuple[str, str]]): The path relative to the paper
+            folder and the blob hexsha of each of their .tex files
+    """
+    repo = git.Repo(thesis_path)
+    with shelve.open(str(blob_texts_path), flag="r") as blob_texts:
+        tex_files = _read_tex_files(tex_blobs, blob_texts)
+    st = create_stats_from_sha(shas[0], repo, tex_files=tex_files)[0]
+    for sha in shas:
+        # Only what create_stats_from_sha takes from the commit changes. A copy,
+        # so what save_as_text stores doesn't end up in the next pickle
+        commit = repo.commit(sha)
+        commit_st = copy.copy(st)
+        commit_st.commit_hash = sha
+        commit_st.date = commit.committed_date
+        commit_st.description = commit.message.partition("\n")[0]
+        commit_st.pickle()
+        commit_st.save_as_text()
+
+
+def create_all_stats(processes: Optional[int] = None) -> None:
+    """Creates a Stats class for all commits in the repository, merging all tex
+    files. The files are read from the commits without checking them out, so
+    they can be done in parallel. Commits with the same text as another one
+    (such as ones that only change figures) are computed only once.
+
+        Args:
+            processes (int, optional): Number of processes used. Defaults to
+            None, which uses one per cpu.
+    """
 
     commits = load_commit_list()
-    starting_commit = commits[0]["sha"]
+    shas = [commit["sha"] for commit in commits]
+
+    # Most files are the same from one commit to the next, so each different
+    # file is decoded only once, and kept for the next runs
     repo = git.Repo(thesis_path)
-    repo.git.checkout(starting_commit, force=True)
-
-    for i, commit in enumerate(commits):
-        print('Creating stats for', commit['sha'], f'{i+1}/{len(commits)}', flush=True)
-        st = create_stats_from_sha(
-            commit["sha"],
-            repo,
-        )[0]
-        print('\tSaving pickle', flush=True)
-        st.pickle()
-        print('\tSaving text', flush=True)
-        st.save_as_text()
+    os.makedirs(cache_path, exist_ok=True)
+    # The .tex files and commits of each different full text, by the hash of
+    # its blobs
+    groups: Dict[bytes, Tuple[List[Tuple[str, str]], List[str]]] = {}
+    with shelve.open(str(blob_texts_path)) as blob_texts:
+        for sha in shas:
+            # The tree of each commit is only gone through here
+            tex_blobs = _tex_blobs(repo.commit(sha), "**/*.tex")
+            # The blob hexshas already identify the contents of the files, so
+            # the same blobs, in the same order, give the same full text
+            text_hash = hashlib.blake2b()
+            for _, blob in tex_blobs:
+                if blob.hexsha not in blob_texts:
+                    blob_texts[blob.hexsha] = _decode_tex(blob.data_stream.read())
+                text_hash.update(blob.binsha)
+            files = [(relative_path, blob.hexsha) for relative_path, blob in tex_blobs]
+            groups.setdefault(text_hash.digest(), (files, []))[1].append(sha)
+    group_files = [files for files, _ in groups.values()]
+    group_shas = [group for _, group in groups.values()]
+
+    # New processes instead of forks, so they don't inherit the state of this
+    # one (numpy/BLAS threads, the open repository)
+    with ProcessPoolExecutor(
+        processes, mp_context=multiprocessing.get_context("spawn")
+    ) as executor:
+        results = executor.map(
+            _create_stats_group, group_shas, group_files, chunksize=1
+        )
+        done = 0
+        for group, _ in zip(group_shas, results):
+            done += len(group)
+            print("Created stats for", group[0], f"{done}/{len(shas)}", flush=True)